@@ -0,0 +1,159 @@
+"""
+Async versions of the hottest routes, used when DAYPLAN_DB_MODE=async.
+
+Handlers are `async def` on an AsyncSession, so a request waiting on the
+database no longer holds a threadpool thread. The queries themselves are
+the ones in crud.py / repositories.py: each call runs on the session's
+sync facade through AsyncSession.run_sync, and the result is converted to
+its response schema inside the call, while lazy relationships can still load.
+
+The router is included ahead of the sync routes in main.py, so it shadows
+them for the same paths; every other route stays sync.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import TypeAdapter
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+import crud, schemas, services, repositories, database
+from cache import analytics_cache
+
+async def get_async_db():
+    async with database.get_async_sessionmaker()() as db:
+        yield db
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+async def run(db, fn: Callable, *args, schema: Any = None, **kwargs):
+    """Runs a sync crud/repository call on the async session."""
+    def call(session):
+        result = fn(session, *args, **kwargs)
+        if schema is not None and result is not None:
+            return _adapter(schema).validate_python(result, from_attributes=True)
+        return result
+    return await db.run_sync(call)
+
+def build_router(owner_id: int) -> APIRouter:
+    router = APIRouter()
+
+    def analytics(endpoint, params, compute):
+        # compute(repo) runs only on a cache miss
+        def call(session):
+            repo = repositories.DailyDataRepository(session, owner_id)
+            return analytics_cache.get_or_compute(owner_id, endpoint, params, lambda: compute(repo), db=session)
+        return call
+
+    # --- FINANCE ---
+    @router.get("/finance/", response_model=List[schemas.Finance])
+    async def read_finances(
+        response: Response,
+        skip: int = 0,
+        limit: int = Query(100, ge=1, le=crud.MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        from_date: Optional[date] = Query(None, alias="from"),
+        to_date: Optional[date] = Query(None, alias="to"),
+        db=Depends(get_async_db)
+    ):
+        today = datetime.now().date()
+        if skip:
+            return await run(db, crud.get_finances, owner_id=owner_id, skip=skip, limit=limit, date=today,
+                             schema=List[schemas.Finance])
+        if not from_date and not to_date:
+            from_date = to_date = today
+
+        def page(session):
+            rows, next_cursor = crud.get_finances_page(session, owner_id, limit, cursor, from_date, to_date)
+            return _adapter(List[schemas.Finance]).validate_python(rows, from_attributes=True), next_cursor
+        try:
+            rows, next_cursor = await db.run_sync(page)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return rows
+
+    @router.post("/finance/", response_model=schemas.Finance)
+    async def create_finance(finance: schemas.FinanceCreate, db=Depends(get_async_db)):
+        db_finance = await run(db, crud.create_finance, finance=finance, owner_id=owner_id, schema=schemas.Finance)
+        return db_finance
+
+    @router.get("/finance/balance")
+    async def read_balance(db=Depends(get_async_db)):
+        return {"balance": await run(db, crud.get_balance, owner_id=owner_id)}
+
+    @router.get("/finance/stats/daily", response_model=schemas.DailyStat)
+    async def read_daily_stats(db=Depends(get_async_db)):
+        return await run(db, crud.get_daily_stats, owner_id=owner_id)
+
+    # --- WORK ---
+    @router.get("/work/today", response_model=schemas.WorkStatus)
+    async def read_work_today(db=Depends(get_async_db)):
+        return await run(db, crud.get_today_work_status, owner_id=owner_id)
+
+    @router.put("/work/today", response_model=schemas.WorkStatus)
+    async def update_work_today(status: schemas.WorkStatus, db=Depends(get_async_db)):
+        work_status = await run(db, crud.update_today_work_status, owner_id=owner_id, status=status,
+                                schema=schemas.WorkStatus)
+        return work_status
+
+    # --- HEALTH ---
+    @router.get("/health/sport-logs/", response_model=List[schemas.SportLog])
+    async def read_sport_logs(db=Depends(get_async_db)):
+        today = datetime.today().date()
+        return await run(db, crud.get_sport_logs, owner_id=owner_id, date=today, schema=List[schemas.SportLog])
+
+    @router.get("/health/sleep/today", response_model=Optional[schemas.SleepLog])
+    async def get_sleep_log_today(db=Depends(get_async_db)):
+        return await run(db, crud.get_sleep_log, owner_id=owner_id, date=datetime.now(), schema=schemas.SleepLog)
+
+    @router.get("/health/habits/today", response_model=schemas.DailyHabit)
+    async def get_daily_habit_today(db=Depends(get_async_db)):
+        habit = await run(db, crud.get_daily_habit, owner_id=owner_id, date=datetime.now(), schema=schemas.DailyHabit)
+        if not habit:
+            raise HTTPException(status_code=404, detail="No daily habit record found")
+        return habit
+
+    # --- MIND ---
+    @router.get("/mind/logs/", response_model=List[schemas.MindLog])
+    async def read_mind_logs(db=Depends(get_async_db)):
+        today = datetime.now().date()
+        return await run(db, crud.get_mind_logs, owner_id=owner_id, date=today, schema=List[schemas.MindLog])
+
+    # --- ANALYTICS ---
+    @router.get("/analytics/discipline/today", response_model=schemas.DisciplineScore)
+    async def get_daily_discipline(date_str: str = Query(None, description="YYYY-MM-DD"), db=Depends(get_async_db)):
+        target_date = datetime.now().date()
+        if date_str:
+            try:
+                target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            except ValueError:
+                pass
+        return await db.run_sync(analytics(
+            "discipline/today", (target_date,),
+            lambda repo: schemas.DisciplineScore(
+                date=str(target_date),
+                score=services.DisciplineCalculator(repo).calculate_daily_score(target_date)
+            )
+        ))
+
+    @router.get("/analytics/correlations", response_model=schemas.CorrelationResponse)
+    async def get_correlations(days: int = Query(30, description="Window in days: 30, 90 or 365"), db=Depends(get_async_db)):
+        if days not in services.CORRELATION_WINDOWS:
+            raise HTTPException(status_code=400, detail="days must be one of 30, 90, 365")
+        return await db.run_sync(analytics(
+            "correlations", (days,),
+            lambda repo: schemas.CorrelationResponse(
+                window_days=days, **services.AnalyticsService(repo).get_correlations(days)
+            )
+        ))
+
+    @router.get("/analytics/weekly-summary", response_model=schemas.WeeklySummary)
+    async def get_weekly_summary(db=Depends(get_async_db)):
+        return await db.run_sync(analytics(
+            "weekly-summary", (),
+            lambda repo: schemas.WeeklySummary(summary=services.WeeklyReviewer(repo).generate_summary())
+        ))
+
+    return router
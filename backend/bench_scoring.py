@@ -0,0 +1,79 @@
+"""
+Compares the per-day discipline score with the scoring engine on synthetic data.
+
+Builds random rollup totals for USERS x DAYS rows and scores them three ways:
+"per-day" calls rollups.discipline_score once per row (what
+DisciplineCalculator does, minus its rollup query per call); "engine-python"
+and "engine-numpy" are scoring.score without and with numpy. Also checks
+that the engine reproduces the per-day scores with the default profile.
+
+Usage: python bench_scoring.py [--users N] [--days D] [--runs R]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+import lazy_numpy
+import rollups
+import scoring
+
+def synthetic_rows(users: int, days: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    rows = []
+    for owner_id in range(1, users + 1):
+        for offset in range(days):
+            work_planned = rng.randint(0, 2)
+            mind_planned = rng.randint(0, 5)
+            rows.append({
+                "owner_id": owner_id,
+                "date": start + timedelta(days=offset),
+                "sleep_hours": round(rng.uniform(0, 11), 2),
+                "work_planned": work_planned,
+                "work_completed": rng.randint(0, work_planned),
+                "mind_planned": mind_planned,
+                "mind_completed": rng.randint(0, mind_planned),
+                "sport_completed": rng.randint(0, 2),
+                "meal_count": rng.randint(0, 4),
+                "morning_hygiene_done": rng.random() < 0.6,
+            })
+    return rows
+
+def timed(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.users, args.days)
+    features = scoring.DailyFeatures.from_rows(rows)
+    print(f"{args.users} users x {args.days} days = {len(rows)} rows, median of {args.runs} runs")
+
+    per_day = [rollups.discipline_score(row) for row in rows]
+    results = {
+        "per-day": timed(lambda: [rollups.discipline_score(row) for row in rows], args.runs),
+        "engine-python": timed(lambda: scoring.score(features, vectorized=False), args.runs),
+    }
+    if lazy_numpy.load() is not None:
+        results["engine-numpy"] = timed(lambda: scoring.score(features), args.runs)
+
+    for name, ms in results.items():
+        print(f"{name:14} {ms:9.1f} ms  {len(rows) / ms * 1000:12,.0f} rows/s  x{results['per-day'] / ms:5.1f}")
+
+    for vectorized in (False, True):
+        scores = scoring.score(features, vectorized=vectorized)["score"]
+        mismatches = sum(1 for a, b in zip(per_day, scores) if abs(a - float(b)) > 1e-9)
+        print(f"{'vectorized' if vectorized else 'python':10} differs from per-day on {mismatches} of {len(rows)} rows")
+
+if __name__ == "__main__":
+    main()
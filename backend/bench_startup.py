@@ -0,0 +1,66 @@
+"""
+Measures how long `import main` takes and how much memory the worker holds
+right after it, the cost every cold API worker pays before its first request.
+
+Each run happens in a fresh interpreter inside a scratch directory (main.py
+creates its SQLite file in the working directory). The "eager" mode imports
+numpy and pandas up front, as services.py used to; "lazy" is the current app.
+
+Usage: python bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+for name in {preload!r}:
+    try:
+        __import__(name)
+    except ImportError:
+        pass
+import main
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss_kb //= 1024
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "rss_mb": rss_kb / 1024,
+    "numpy": "numpy" in sys.modules,
+    "pandas": "pandas" in sys.modules,
+}}))
+"""
+
+MODES = {
+    "eager": ["numpy", "pandas"],
+    "lazy": [],
+}
+
+def measure(preload, workdir):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(preload=preload)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main(runs: int = 5):
+    with tempfile.TemporaryDirectory() as workdir:
+        # Warm the OS file cache so the first mode is not penalised
+        measure([], workdir)
+        for mode, preload in MODES.items():
+            samples = [measure(preload, workdir) for _ in range(runs)]
+            import_ms = statistics.median(s["import_ms"] for s in samples)
+            rss_mb = statistics.median(s["rss_mb"] for s in samples)
+            loaded = [name for name in ("numpy", "pandas") if samples[0][name]]
+            print(f"{mode:6} import {import_ms:8.1f} ms   rss {rss_mb:7.1f} MB   loaded: {', '.join(loaded) or '-'}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,169 @@
+"""
+In-process cache for /analytics/* responses.
+
+Entries are keyed by (owner_id, endpoint, params), expire after a TTL and
+are evicted least-recently-used first. Each entry remembers which life
+modules it was computed from, so a write only drops what it can affect.
+
+An entry is only served while the persisted versions of its modules (the
+ones behind the ETags, see etag.py) are still those it was computed from,
+so a write served by another worker is never answered from a stale entry.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+# Life modules a write can touch
+FINANCE = "finance"
+WORK = "work"
+SLEEP = "sleep"
+HABITS = "habits"
+SPORT = "sport"
+MIND = "mind"
+
+# Reference data, only read by the plain CRUD endpoints
+FINANCE_CATEGORIES = "finance_categories"
+EXERCISE_TYPES = "exercise_types"
+MIND_TASK_TYPES = "mind_task_types"
+
+DISCIPLINE_MODULES = frozenset([SLEEP, WORK, MIND, SPORT, HABITS])
+
+# Analytics endpoint -> modules its response is computed from
+ENDPOINT_MODULES: Dict[str, FrozenSet[str]] = {
+    "discipline/today": DISCIPLINE_MODULES,
+    "discipline": DISCIPLINE_MODULES,
+    "correlations": DISCIPLINE_MODULES | {FINANCE},
+    "finance-health": frozenset([FINANCE]),
+    "weekly-summary": DISCIPLINE_MODULES,
+    "stats/work": frozenset([WORK]),
+    "stats/health": frozenset([SLEEP, SPORT, HABITS]),
+    "stats/mind": frozenset([MIND]),
+    "streaks": frozenset([WORK, SPORT, MIND, HABITS]),
+}
+
+# /analytics/history/{module} prefix -> module
+HISTORY_MODULES = [
+    ("work", WORK),
+    ("health_sleep", SLEEP),
+    ("health_sport", SPORT),
+    ("mind_tasks", MIND),
+    ("finance_expense", FINANCE),
+]
+
+def endpoint_modules(endpoint: str) -> FrozenSet[str]:
+    if endpoint.startswith("history/"):
+        module = endpoint[len("history/"):]
+        for prefix, name in HISTORY_MODULES:
+            if module.startswith(prefix):
+                return frozenset([name])
+        return frozenset()
+    return ENDPOINT_MODULES[endpoint]
+
+class AnalyticsCache:
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expires_at, modules, versions, value), oldest use first
+        self._entries: "OrderedDict[Tuple, Tuple[float, FrozenSet[str], Tuple[int, ...], Any]]" = OrderedDict()
+        # versions(owner_id, modules, db) -> persisted versions; set by changes.py
+        self.versions: Optional[Callable[..., Tuple[int, ...]]] = None
+        self._lock = threading.Lock()
+        # owner_id -> bumped on every invalidation; a value computed while a
+        # write was committing must not be stored over the invalidation
+        self._generations: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, owner_id: int, endpoint: str, params: Tuple[Hashable, ...], compute: Callable[[], Any],
+                       db=None) -> Any:
+        """db: the caller's session, the versions are read on it (run_sync's in async mode)."""
+        # Everything here is relative to "today", so the day is part of the key
+        key = (owner_id, endpoint, params, datetime.now().date())
+        modules = endpoint_modules(endpoint)
+        names = sorted(modules)
+        # Read before computing: a write committing meanwhile makes the entry look older, never newer
+        versions = self.versions(owner_id, names, db) if self.versions else ()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[2] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[3]
+            self.misses += 1
+            generation = self._generations.get(owner_id, 0)
+
+        value = compute()
+
+        with self._lock:
+            if self._generations.get(owner_id, 0) != generation:
+                return value
+            self._entries[key] = (time.monotonic() + self.ttl, modules, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, owner_id: int, *modules: str):
+        """Drops the owner's entries computed from any of the given modules."""
+        changed = set(modules)
+        with self._lock:
+            self._generations[owner_id] = self._generations.get(owner_id, 0) + 1
+            stale = [
+                key for key, (_, deps, _, _) in self._entries.items()
+                if key[0] == owner_id and deps & changed
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+analytics_cache = AnalyticsCache()
+
+class ResourceVersions:
+    """
+    Announces committed writes per owner and resource to in-process listeners.
+    The versions themselves are persisted with the change feed (changes.versions),
+    so every worker agrees on them.
+    """
+    def __init__(self):
+        self._listeners: List[Callable[[int, Tuple[str, ...]], None]] = []
+
+    def listen(self, listener: Callable[[int, Tuple[str, ...]], None]):
+        """listener(owner_id, resources) is called after every bump, e.g. to push events."""
+        self._listeners.append(listener)
+
+    def bump(self, owner_id: int, *resources: str):
+        for listener in self._listeners:
+            listener(owner_id, resources)
+
+resource_versions = ResourceVersions()
+
+# A write in this process drops the analytics built from it right away; writes
+# served by other workers are caught by the version check in get_or_compute
+resource_versions.listen(lambda owner_id, resources: analytics_cache.invalidate(owner_id, *resources))
@@ -0,0 +1,147 @@
+"""
+Change feed behind /sync/changes?since=N.
+
+Every flush that inserts, updates or deletes a row of a TRACKED table
+appends one entry per row to the changes table, on the same connection
+and in the same transaction as the write itself, so a change is visible
+exactly when its row is. Writes done with Core statements instead of the
+ORM (provisioning's INSERT ... SELECT) call record_query.
+
+Sequence numbers come from a per-owner counter (users.change_seq) moved
+with an UPDATE in the same transaction. That UPDATE holds the owner's row
+lock until the commit, so a later writer gets higher numbers only after
+the earlier one committed: on PostgreSQL too, a reader never sees seq N
+while a lower one is still pending, and since= never skips a change.
+
+The latest seq per resource is also that resource's version, behind the
+ETags and the analytics cache (versions()).
+"""
+from sqlalchemy import event, func, insert, literal, select, update
+from sqlalchemy.orm import Session, joinedload
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import models, schemas, database, cache
+
+FEED_LIMIT = 500
+
+# table -> (model, response schema, relationships the schema includes)
+TRACKED = {
+    "finances": (models.Finance, schemas.Finance, [models.Finance.category]),
+    "finance_categories": (models.FinanceCategory, schemas.FinanceCategory, []),
+    "works": (models.Work, schemas.Work, []),
+    "sleep_logs": (models.SleepLog, schemas.SleepLog, []),
+    "daily_habits": (models.DailyHabit, schemas.DailyHabit, []),
+    "exercise_types": (models.ExerciseType, schemas.ExerciseType, []),
+    "sport_logs": (models.SportLog, schemas.SportLog, [models.SportLog.exercise_type]),
+    "mind_task_types": (models.MindTaskType, schemas.MindTaskType, []),
+    "mind_logs": (models.MindLog, schemas.MindLog, [models.MindLog.task_type]),
+}
+
+# cache resource -> table whose latest change is its version
+RESOURCE_TABLES = {
+    cache.FINANCE: "finances",
+    cache.FINANCE_CATEGORIES: "finance_categories",
+    cache.WORK: "works",
+    cache.SLEEP: "sleep_logs",
+    cache.HABITS: "daily_habits",
+    cache.EXERCISE_TYPES: "exercise_types",
+    cache.SPORT: "sport_logs",
+    cache.MIND_TASK_TYPES: "mind_task_types",
+    cache.MIND: "mind_logs",
+}
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session: Session, flush_context):
+    # new/dirty/deleted still describe what this flush wrote
+    entries = []
+    for op, objects in (("upsert", session.new), ("upsert", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if obj.__tablename__ not in TRACKED or obj.owner_id is None:
+                continue
+            if op == "upsert" and obj not in session.new and not session.is_modified(obj, include_collections=False):
+                continue
+            entries.append({"owner_id": obj.owner_id, "resource": obj.__tablename__, "row_id": obj.id, "op": op})
+    if not entries:
+        return
+    conn = session.connection()
+    for owner_id in sorted({e["owner_id"] for e in entries}):
+        owned = [e for e in entries if e["owner_id"] == owner_id]
+        first = _reserve(conn, owner_id, len(owned))
+        for i, entry in enumerate(owned):
+            entry["seq"] = first + i
+    conn.execute(insert(models.Change), entries)
+
+def _reserve(conn, owner_id: int, count: int) -> int:
+    # Moves the owner's counter by count (locking the owner row) and returns the first new number
+    last = conn.execute(
+        update(models.User).where(models.User.id == owner_id)
+        .values(change_seq=func.coalesce(models.User.change_seq, 0) + count)
+        .returning(models.User.change_seq)
+    ).scalar()
+    return last - count + 1
+
+def record_query(db: Session, owner_id: int, model, *filters):
+    """Records an upsert of every row of model matching filters, e.g. after a Core INSERT."""
+    matching = select(model.id).where(model.owner_id == owner_id, *filters)
+    count = db.execute(select(func.count()).select_from(matching.subquery())).scalar()
+    if not count:
+        return
+    first = _reserve(db.connection(), owner_id, count)
+    rows = select(
+        literal(owner_id), literal(model.__tablename__), model.id, literal("upsert"),
+        literal(first - 1) + func.row_number().over(order_by=model.id),
+    ).where(model.owner_id == owner_id, *filters)
+    db.execute(insert(models.Change).from_select(["owner_id", "resource", "row_id", "op", "seq"], rows))
+
+def versions(owner_id: int, resources: Iterable[str], db: Optional[Session] = None) -> Tuple[int, ...]:
+    """
+    Version of each resource: the seq of the owner's latest change to it. Kept in
+    the database, so every worker sees the same values; one indexed max per resource.
+    Read on db when given, else on a connection of its own.
+    """
+    columns = [
+        select(func.coalesce(func.max(models.Change.seq), 0)).where(
+            models.Change.owner_id == owner_id, models.Change.resource == RESOURCE_TABLES[resource]
+        ).scalar_subquery()
+        for resource in resources
+    ]
+    if not columns:
+        return ()
+    if db is not None:
+        return tuple(db.execute(select(*columns)).one())
+    with database.engine.connect() as conn:
+        return tuple(conn.execute(select(*columns)).one())
+
+cache.analytics_cache.versions = versions
+
+def since(db: Session, owner_id: int, seq: int, limit: int = FEED_LIMIT) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """
+    Rows changed after seq, each once with its latest change and current data.
+    Returns (changes, version to pass as the next since, whether more are pending).
+    """
+    entries = db.query(models.Change).filter(
+        models.Change.owner_id == owner_id,
+        models.Change.seq > seq
+    ).order_by(models.Change.seq).limit(limit).all()
+    if not entries:
+        return [], max(seq, 0), False
+
+    last: Dict[Tuple[str, int], models.Change] = {}
+    for entry in entries:
+        last.pop((entry.resource, entry.row_id), None)
+        last[(entry.resource, entry.row_id)] = entry # Re-inserted, so dict order stays seq order
+
+    rows: Dict[str, Dict[int, Any]] = {}
+    for resource in {r for r, _ in last}:
+        model, schema, relations = TRACKED[resource]
+        ids = [row_id for r, row_id in last if r == resource]
+        query = db.query(model).options(*[joinedload(rel) for rel in relations])
+        rows[resource] = {row.id: row for row in query.filter(model.owner_id == owner_id, model.id.in_(ids))}
+
+    feed = []
+    for (resource, row_id), entry in last.items():
+        row: Optional[Any] = rows[resource].get(row_id)
+        # Gone since: report the delete even if this entry was an upsert
+        op = "upsert" if row is not None else "delete"
+        data = TRACKED[resource][1].model_validate(row).model_dump(mode="json") if row is not None else None
+        feed.append({"seq": entry.seq, "resource": resource, "op": op, "id": row_id, "data": data})
+    return feed, entries[-1].seq, len(entries) == limit
@@ -1,7 +1,56 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-import models, schemas
+from sqlalchemy import func, and_, case, tuple_
+import models, schemas, rollups, provisioning, ledger, cache
+from cache import resource_versions
+from repositories import day_bounds
 from datetime import datetime, timedelta, date
+import base64
+
+def on_day(column, day: date):
+    # Half-open range instead of func.date(column) == day, so the
+    # (owner_id, date) indexes can be used
+    day_start, next_day = day_bounds(day, day)
+    return and_(column >= day_start, column < next_day)
+
+def encode_cursor(when: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{when.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """(datetime, id) of an encode_cursor value; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        when, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(when), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+MAX_PAGE_SIZE = 1000
+
+def keyset_page(query, column, id_column, limit: int, cursor: str = None, start: date = None, end: date = None):
+    """
+    One page of query, newest first, keyset-paginated on (column, id).
+    Every page costs the same: the cursor is a seek on the (owner_id, date)
+    indexes instead of an OFFSET. Returns (rows, next_cursor or None).
+    """
+    if limit < 1:
+        return [], None
+    if start:
+        query = query.filter(column >= day_bounds(start, start)[0])
+    if end:
+        query = query.filter(column < day_bounds(end, end)[1])
+    if cursor:
+        when, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(column, id_column) < tuple_(when, row_id))
+    rows = query.order_by(column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, column.key), last.id)
+
+def _changed(owner_id: int, *resources: str):
+    # Call right after the commit, so listeners (events, analytics cache) act on committed data
+    resource_versions.bump(owner_id, *resources)
 
 # --- FINANCE ---
 def get_finance_categories(db: Session, owner_id: int):
@@ -12,108 +61,128 @@ def create_finance_category(db: Session, category: schemas.FinanceCategoryCreate
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    _changed(owner_id, cache.FINANCE_CATEGORIES)
     return db_category
 
 def get_finances(db: Session, owner_id: int, skip: int = 0, limit: int = 100, date: date = None):
     query = db.query(models.Finance).options(joinedload(models.Finance.category)).filter(models.Finance.owner_id == owner_id)
     if date:
-        query = query.filter(func.date(models.Finance.date) == str(date))
+        query = query.filter(on_day(models.Finance.date, date))
     return query.order_by(models.Finance.date.desc()).offset(skip).limit(limit).all()
 
+def get_finances_page(db: Session, owner_id: int, limit: int = 100, cursor: str = None, start: date = None, end: date = None):
+    query = db.query(models.Finance).options(joinedload(models.Finance.category)).filter(models.Finance.owner_id == owner_id)
+    return keyset_page(query, models.Finance.date, models.Finance.id, limit, cursor, start, end)
+
 def create_finance(db: Session, finance: schemas.FinanceCreate, owner_id: int):
-    # ... (existing content)
+    ledger.lock(db, owner_id)
     db_finance = models.Finance(**finance.model_dump(), owner_id=owner_id)
     db.add(db_finance)
+    db.flush()
+    ledger.record(db, owner_id, ledger.delta(db_finance.type, db_finance.amount))
+    rollups.refresh_day(db, owner_id, db_finance.date.date())
     db.commit()
     db.refresh(db_finance)
-    
-    # Update User Balance
-    user = db.query(models.User).filter(models.User.id == owner_id).first()
-    if user:
-        if finance.type == "expense":
-            user.balance -= finance.amount
-        elif finance.type in ["active_income", "passive_income"]:
-            user.balance += finance.amount
-        db.commit()
-        
+    _changed(owner_id, cache.FINANCE)
     return db_finance
 
 def update_finance(db: Session, finance_id: int, finance_update: schemas.FinanceCreate):
     db_finance = db.query(models.Finance).filter(models.Finance.id == finance_id).first()
     if db_finance:
-        # Revert old balance logic if needed (complex), for now just update fields
-        # Ideally, we should rollback old amount and apply new amount to user balance
-        old_amount = db_finance.amount
-        old_type = db_finance.type
+        old_delta = ledger.delta(db_finance.type, db_finance.amount)
 
         for key, value in finance_update.model_dump().items():
             setattr(db_finance, key, value)
         
-        # Simple balance correction logic
-        user = db.query(models.User).filter(models.User.id == db_finance.owner_id).first()
-        if user:
-            # Revert old
-            if old_type == "expense": user.balance += old_amount
-            else: user.balance -= old_amount
-            
-            # Apply new
-            if finance_update.type == "expense": user.balance -= finance_update.amount
-            else: user.balance += finance_update.amount
-            
+        ledger.forget_from(db, db_finance.owner_id, db_finance.id)
+        ledger.record(db, db_finance.owner_id, ledger.delta(db_finance.type, db_finance.amount) - old_delta)
+        rollups.refresh_day(db, db_finance.owner_id, db_finance.date.date())
         db.commit()
         db.refresh(db_finance)
+        _changed(db_finance.owner_id, cache.FINANCE)
+    return db_finance
+
+def delete_finance(db: Session, finance_id: int):
+    # Category is loaded up front, the returned row is detached after the commit
+    db_finance = db.query(models.Finance).options(joinedload(models.Finance.category)).filter(models.Finance.id == finance_id).first()
+    if db_finance:
+        owner_id = db_finance.owner_id
+        day = db_finance.date.date()
+        old_delta = ledger.delta(db_finance.type, db_finance.amount)
+        db.delete(db_finance)
+        ledger.forget_from(db, owner_id, finance_id)
+        ledger.record(db, owner_id, -old_delta)
+        rollups.refresh_day(db, owner_id, day)
+        db.commit()
+        _changed(owner_id, cache.FINANCE)
     return db_finance
 
 def get_balance(db: Session, owner_id: int):
-    user = db.query(models.User).filter(models.User.id == owner_id).first()
-    if user:
-        return user.balance
-    return 0
-
-def get_monthly_stats(db: Session, owner_id: int):
-    # Fetch all finances for the user
-    # Note: For production with large datasets, do aggregation in SQL using func.strftime
-    finances = db.query(models.Finance).filter(models.Finance.owner_id == owner_id).all()
-    
-    stats = {} # "YYYY-MM" -> {"income": 0, "expense": 0}
-    
-    for f in finances:
-        month_key = f.date.strftime("%Y-%m")
-        if month_key not in stats:
-            stats[month_key] = {"income": 0, "expense": 0}
-            
-        if f.type == "expense":
-            stats[month_key]["expense"] += f.amount
-        elif f.type in ["active_income", "passive_income"]:
-            stats[month_key]["income"] += f.amount
-            
-    # Convert to list
-    result = []
-    # Sort keys to be chronological
-    for key in sorted(stats.keys()):
-        result.append(schemas.MonthlyStat(
-            month=key,
-            total_income=stats[key]["income"],
-            total_expense=stats[key]["expense"]
-        ))
-        
-    return result
+    return ledger.balance(db, owner_id)
+
+def _month_of(db: Session, column):
+    # "YYYY-MM" of a datetime column, computed by the database
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+def _finance_window(owner_id: int, start: date = None, end: date = None):
+    filters = [models.Finance.owner_id == owner_id]
+    if start:
+        filters.append(models.Finance.date >= day_bounds(start, start)[0])
+    if end:
+        filters.append(models.Finance.date < day_bounds(end, end)[1])
+    return filters
+
+_income_amount = case((models.Finance.type.in_(["active_income", "passive_income"]), models.Finance.amount), else_=0)
+_expense_amount = case((models.Finance.type == "expense", models.Finance.amount), else_=0)
+
+def get_monthly_stats(db: Session, owner_id: int, start: date = None, end: date = None):
+    month = _month_of(db, models.Finance.date).label("month")
+    rows = db.query(
+        month,
+        func.coalesce(func.sum(_income_amount), 0),
+        func.coalesce(func.sum(_expense_amount), 0),
+    ).filter(*_finance_window(owner_id, start, end)).group_by(month).order_by(month).all()
+
+    return [
+        schemas.MonthlyStat(month=key, total_income=income, total_expense=expense)
+        for key, income, expense in rows
+    ]
+
+def get_monthly_breakdown(db: Session, owner_id: int, start: date = None, end: date = None):
+    month = _month_of(db, models.Finance.date).label("month")
+    rows = db.query(
+        month,
+        models.Finance.type,
+        models.Finance.category_id,
+        models.FinanceCategory.name,
+        func.coalesce(func.sum(models.Finance.amount), 0),
+        func.count(models.Finance.id),
+    ).outerjoin(
+        models.FinanceCategory, models.FinanceCategory.id == models.Finance.category_id
+    ).filter(*_finance_window(owner_id, start, end)).group_by(
+        month, models.Finance.type, models.Finance.category_id, models.FinanceCategory.name
+    ).order_by(month, models.Finance.type, models.Finance.category_id).all()
+
+    return [
+        schemas.MonthlyBreakdown(
+            month=key, type=f_type, category_id=category_id,
+            category_name=category_name, total=total, count=count
+        )
+        for key, f_type, category_id, category_name, total, count in rows
+    ]
 
 def get_daily_stats(db: Session, owner_id: int):
     today = datetime.now().date()
-    # Simple Python filtering for MVP (assuming small dataset)
-    finances = db.query(models.Finance).filter(models.Finance.owner_id == owner_id).all()
-    
-    income = 0.0
-    expense = 0.0
-    
-    for f in finances:
-        if f.date.date() == today:
-            if f.type == "expense":
-                expense += f.amount
-            elif f.type in ["active_income", "passive_income"]:
-                income += f.amount
-                
+    income, expense = db.query(
+        func.coalesce(func.sum(_income_amount), 0),
+        func.coalesce(func.sum(_expense_amount), 0),
+    ).filter(
+        models.Finance.owner_id == owner_id,
+        on_day(models.Finance.date, today)
+    ).one()
+
     return schemas.DailyStat(
         date=str(today),
         total_income=income,
@@ -123,10 +192,9 @@ def get_daily_stats(db: Session, owner_id: int):
 # --- WORK ---
 def get_today_work_status(db: Session, owner_id: int) -> schemas.WorkStatus:
     today = datetime.now().date()
-    # Filter by date string matching
     works = db.query(models.Work).filter(
         models.Work.owner_id == owner_id,
-        func.date(models.Work.date) == str(today)
+        on_day(models.Work.date, today)
     ).all()
     
     active = any(w.type == "active" for w in works)
@@ -137,12 +205,11 @@ def get_today_work_status(db: Session, owner_id: int) -> schemas.WorkStatus:
 
 def update_today_work_status(db: Session, owner_id: int, status: schemas.WorkStatus):
     today = datetime.now()
-    today_str = str(today.date())
     
     # Get existing
     works = db.query(models.Work).filter(
         models.Work.owner_id == owner_id,
-        func.date(models.Work.date) == today_str
+        on_day(models.Work.date, today.date())
     ).all()
     
     existing_active = next((w for w in works if w.type == "active"), None)
@@ -160,7 +227,9 @@ def update_today_work_status(db: Session, owner_id: int, status: schemas.WorkSta
     elif not status.passive and existing_passive:
         db.delete(existing_passive)
         
+    rollups.refresh_day(db, owner_id, today.date())
     db.commit()
+    _changed(owner_id, cache.WORK)
     return get_today_work_status(db, owner_id)
 
 # --- HEALTH ---
@@ -172,42 +241,43 @@ def create_exercise_type(db: Session, exercise: schemas.ExerciseTypeCreate, owne
     db.add(db_exercise)
     db.commit()
     db.refresh(db_exercise)
+    _changed(owner_id, cache.EXERCISE_TYPES)
     return db_exercise
 
 def get_sport_logs(db: Session, owner_id: int, date: date = None):
-    today_str = str(date) if date else None
-    
     # Base query
     query = db.query(models.SportLog).options(joinedload(models.SportLog.exercise_type)).filter(models.SportLog.owner_id == owner_id)
     
     if date:
         today = date
         # Filter query by date as well
-        query = query.filter(func.date(models.SportLog.date) == today_str)
-        
-        # Get all ExerciseType for Today
-        exercise_types = db.query(models.ExerciseType).filter(models.ExerciseType.owner_id == owner_id).all()
+        query = query.filter(on_day(models.SportLog.date, today))
         
         # create sport log for each exercise type if not exists
-        for exercise_type in exercise_types:
-            # Check using func.date to match day regardless of time
-            exists = db.query(models.SportLog).filter(
-                models.SportLog.owner_id == owner_id, 
-                models.SportLog.exercise_type_id == exercise_type.id, 
-                func.date(models.SportLog.date) == today_str
-            ).first()
-            
-            if not exists:
-                db.add(models.SportLog(exercise_type_id=exercise_type.id, date=today, owner_id=owner_id, is_completed=False))
-        db.commit()
+        if provisioning.ensure_sport_logs(db, owner_id, today):
+            rollups.refresh_day(db, owner_id, today)
+            db.commit()
+            _changed(owner_id, cache.SPORT)
     
     return query.all()
 
 def create_sport_log(db: Session, log: schemas.SportLogCreate, owner_id: int):
-    db_log = models.SportLog(**log.model_dump(), owner_id=owner_id)
-    db.add(db_log)
+    # One log per exercise type and day: reuse today's (usually auto-provisioned) row
+    db_log = db.query(models.SportLog).filter(
+        models.SportLog.owner_id == owner_id,
+        models.SportLog.exercise_type_id == log.exercise_type_id,
+        on_day(models.SportLog.date, datetime.now().date())
+    ).first()
+    if db_log:
+        db_log.is_completed = log.is_completed
+    else:
+        db_log = models.SportLog(**log.model_dump(), owner_id=owner_id)
+        db.add(db_log)
+    db.flush()
+    rollups.refresh_day(db, owner_id, db_log.date.date())
     db.commit()
     db.refresh(db_log)
+    _changed(owner_id, cache.SPORT)
     return db_log
 
 def update_exercise_type(db: Session, type_id: int, type_update: schemas.ExerciseTypeCreate):
@@ -217,6 +287,7 @@ def update_exercise_type(db: Session, type_id: int, type_update: schemas.Exercis
             setattr(db_type, key, value)
         db.commit()
         db.refresh(db_type)
+        _changed(db_type.owner_id, cache.EXERCISE_TYPES)
     return db_type
 
 def update_sport_log(db: Session, log_id: int, log_update: schemas.SportLogCreate):
@@ -224,23 +295,29 @@ def update_sport_log(db: Session, log_id: int, log_update: schemas.SportLogCreat
     if db_log:
         for key, value in log_update.model_dump().items():
             setattr(db_log, key, value)
+        rollups.refresh_day(db, db_log.owner_id, db_log.date.date())
         db.commit()
         db.refresh(db_log)
+        _changed(db_log.owner_id, cache.SPORT)
     return db_log
 
 def update_sport_log_status(db: Session, log_id: int, is_completed: bool):
     log = db.query(models.SportLog).filter(models.SportLog.id == log_id).first()
     if log:
         log.is_completed = is_completed
+        rollups.refresh_day(db, log.owner_id, log.date.date())
         db.commit()
         db.refresh(log)
+        _changed(log.owner_id, cache.SPORT)
     return log
 
-def get_sport_logs_history(db: Session, owner_id: int, limit: int = 100):
-    return db.query(models.SportLog).options(joinedload(models.SportLog.exercise_type))\
-             .filter(models.SportLog.owner_id == owner_id)\
-             .order_by(models.SportLog.date.desc())\
-             .limit(limit).all()
+def get_sport_logs_history(db: Session, owner_id: int, limit: int = 100, cursor: str = None, start: date = None, end: date = None):
+    query = db.query(models.SportLog).options(joinedload(models.SportLog.exercise_type))\
+              .filter(models.SportLog.owner_id == owner_id)
+    return keyset_page(query, models.SportLog.date, models.SportLog.id, limit, cursor, start, end)
+
+# A sleep still open after this long is closed automatically
+MAX_SLEEP_HOURS = 11
 
 def get_last_sleep_log(db: Session, owner_id: int):
     return db.query(models.SleepLog).filter(
@@ -253,11 +330,13 @@ def check_and_fix_sleep_status(db: Session, owner_id: int):
         # Currently sleeping
         now = datetime.now()
         duration = now - last_log.start_time
-        if duration.total_seconds() > 11 * 3600:
+        if duration.total_seconds() > MAX_SLEEP_HOURS * 3600:
             # Exceeded 11 hours -> Auto wake up
-            last_log.end_time = last_log.start_time + timedelta(hours=11)
+            last_log.end_time = last_log.start_time + timedelta(hours=MAX_SLEEP_HOURS)
+            rollups.refresh_day(db, owner_id, last_log.end_time.date())
             db.commit()
             db.refresh(last_log)
+            _changed(owner_id, cache.SLEEP)
     return last_log
 
 def get_sleep_log(db: Session, owner_id: int, date: datetime):
@@ -268,7 +347,7 @@ def get_daily_habit(db: Session, owner_id: int, date: datetime):
     # Daily habits are day-specific, keyed by date
     return db.query(models.DailyHabit).filter(
         models.DailyHabit.owner_id == owner_id, 
-        func.date(models.DailyHabit.date) == str(date.date())
+        on_day(models.DailyHabit.date, date.date())
     ).first()
 
 def wake_up_user(db: Session, owner_id: int):
@@ -278,15 +357,19 @@ def wake_up_user(db: Session, owner_id: int):
     last_log = check_and_fix_sleep_status(db, owner_id)
     if last_log and not last_log.end_time:
         last_log.end_time = now
+        rollups.refresh_day(db, owner_id, now.date())
         db.commit()
         db.refresh(last_log)
+        _changed(owner_id, cache.SLEEP)
     
     # 2. Start Day (Create Daily Habit)
     today_habit = get_daily_habit(db, owner_id, now)
     if not today_habit:
         today_habit = models.DailyHabit(date=now, owner_id=owner_id)
         db.add(today_habit)
+        rollups.refresh_day(db, owner_id, now.date())
         db.commit()
+        _changed(owner_id, cache.HABITS)
     
     return last_log if last_log else None
 
@@ -306,6 +389,7 @@ def sleep_user(db: Session, owner_id: int):
     db.add(new_log)
     db.commit()
     db.refresh(new_log)
+    _changed(owner_id, cache.SLEEP)
     return new_log
 
 def update_daily_habit(db: Session, habit: schemas.DailyHabitCreate, owner_id: int):
@@ -314,22 +398,28 @@ def update_daily_habit(db: Session, habit: schemas.DailyHabitCreate, owner_id: i
     if db_habit:
         for key, value in habit.model_dump(exclude_unset=True).items():
             setattr(db_habit, key, value)
+        rollups.refresh_day(db, owner_id, today.date())
         db.commit()
         db.refresh(db_habit)
+        _changed(owner_id, cache.HABITS)
         return db_habit
     else:
         # Create if not exists
         db_habit = models.DailyHabit(**habit.model_dump(), owner_id=owner_id)
         db.add(db_habit)
+        rollups.refresh_day(db, owner_id, today.date())
         db.commit()
         db.refresh(db_habit)
+        _changed(owner_id, cache.HABITS)
         return db_habit
 
-def get_daily_habits(db: Session, owner_id: int, limit: int = 30):
-    return db.query(models.DailyHabit).filter(models.DailyHabit.owner_id == owner_id).order_by(models.DailyHabit.date.desc()).limit(limit).all()
+def get_daily_habits(db: Session, owner_id: int, limit: int = 30, cursor: str = None, start: date = None, end: date = None):
+    query = db.query(models.DailyHabit).filter(models.DailyHabit.owner_id == owner_id)
+    return keyset_page(query, models.DailyHabit.date, models.DailyHabit.id, limit, cursor, start, end)
 
-def get_sleep_logs_history(db: Session, owner_id: int, limit: int = 30):
-    return db.query(models.SleepLog).filter(models.SleepLog.owner_id == owner_id).order_by(models.SleepLog.start_time.desc()).limit(limit).all()
+def get_sleep_logs_history(db: Session, owner_id: int, limit: int = 30, cursor: str = None, start: date = None, end: date = None):
+    query = db.query(models.SleepLog).filter(models.SleepLog.owner_id == owner_id)
+    return keyset_page(query, models.SleepLog.start_time, models.SleepLog.id, limit, cursor, start, end)
 
 # --- MIND ---
 def get_mind_task_types(db: Session, owner_id: int):
@@ -340,7 +430,7 @@ def create_mind_task_type(db: Session, task: schemas.MindTaskTypeCreate, owner_i
     db.add(db_task)
     db.commit()
     db.refresh(db_task)
-    db.refresh(db_task)
+    _changed(owner_id, cache.MIND_TASK_TYPES)
     return db_task
 
 def update_mind_task_type(db: Session, type_id: int, type_update: schemas.MindTaskTypeCreate):
@@ -350,40 +440,40 @@ def update_mind_task_type(db: Session, type_id: int, type_update: schemas.MindTa
             setattr(db_type, key, value)
         db.commit()
         db.refresh(db_type)
+        _changed(db_type.owner_id, cache.MIND_TASK_TYPES)
     return db_type
 
 def get_mind_logs(db: Session, owner_id: int, date: date = None):
     query = db.query(models.MindLog).options(joinedload(models.MindLog.task_type)).filter(models.MindLog.owner_id == owner_id)
     
     if date:
-        today_str = str(date)
-        query = query.filter(func.date(models.MindLog.date) == today_str)
+        query = query.filter(on_day(models.MindLog.date, date))
         
         # Auto-create logs for active task types
-        # Filter for active task types
-        task_types = db.query(models.MindTaskType).filter(
-            models.MindTaskType.owner_id == owner_id,
-            models.MindTaskType.is_active == True
-        ).all()
-        
-        for task_type in task_types:
-            exists = db.query(models.MindLog).filter(
-                models.MindLog.owner_id == owner_id,
-                models.MindLog.task_type_id == task_type.id,
-                func.date(models.MindLog.date) == today_str
-            ).first()
-            
-            if not exists:
-                db.add(models.MindLog(task_type_id=task_type.id, date=date, owner_id=owner_id, is_completed=False))
-        db.commit()
+        if provisioning.ensure_mind_logs(db, owner_id, date):
+            rollups.refresh_day(db, owner_id, date)
+            db.commit()
+            _changed(owner_id, cache.MIND)
         
     return query.all()
 
 def create_mind_log(db: Session, log: schemas.MindLogCreate, owner_id: int):
-    db_log = models.MindLog(**log.model_dump(), owner_id=owner_id)
-    db.add(db_log)
+    # One log per task type and day: reuse today's (usually auto-provisioned) row
+    db_log = db.query(models.MindLog).filter(
+        models.MindLog.owner_id == owner_id,
+        models.MindLog.task_type_id == log.task_type_id,
+        on_day(models.MindLog.date, datetime.now().date())
+    ).first()
+    if db_log:
+        db_log.is_completed = log.is_completed
+    else:
+        db_log = models.MindLog(**log.model_dump(), owner_id=owner_id)
+        db.add(db_log)
+    db.flush()
+    rollups.refresh_day(db, owner_id, db_log.date.date())
     db.commit()
     db.refresh(db_log)
+    _changed(owner_id, cache.MIND)
     return db_log
 
 def update_mind_log(db: Session, log_id: int, log_update: schemas.MindLogCreate):
@@ -391,16 +481,20 @@ def update_mind_log(db: Session, log_id: int, log_update: schemas.MindLogCreate)
     if db_log:
         for key, value in log_update.model_dump().items():
             setattr(db_log, key, value)
+        rollups.refresh_day(db, db_log.owner_id, db_log.date.date())
         db.commit()
         db.refresh(db_log)
+        _changed(db_log.owner_id, cache.MIND)
     return db_log
 
 def update_mind_log_status(db: Session, log_id: int, is_completed: bool):
     log = db.query(models.MindLog).filter(models.MindLog.id == log_id).first()
     if log:
         log.is_completed = is_completed
+        rollups.refresh_day(db, log.owner_id, log.date.date())
         db.commit()
         db.refresh(log)
+        _changed(log.owner_id, cache.MIND)
     return log
 
 def get_user_by_username(db: Session, username: str):
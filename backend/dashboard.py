@@ -0,0 +1,126 @@
+"""
+/dashboard/today: the whole home screen of the app in one response.
+
+Everything is built on one session. Raw rows come from one
+DailyDataRepository.load_range pass (one query per table, sized to the
+longest window any requested section needs); the stats sections share
+the analytics cache with their /analytics/stats/* endpoints.
+"""
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+import crud, provisioning, rollups, schemas, services
+from cache import analytics_cache, resource_versions
+import cache
+from repositories import DailyDataRepository
+
+# section -> {repository module: days of history it needs, today included}
+FIELDS: Dict[str, Dict[str, int]] = {
+    "work": {"works": 1},
+    "balance": {},
+    "finance_daily": {"finances": 1},
+    "sleep": {},
+    "habits": {"daily_habits": 1},
+    "sport_logs": {"sport_logs": 1},
+    "mind_logs": {"mind_logs": 1},
+    "stats_work": {"works": 31},
+    "stats_health": {"sleep_logs": 7, "sport_logs": 7, "daily_habits": 7},
+    "stats_mind": {"mind_logs": 7},
+    "discipline": {},
+}
+
+def parse_fields(fields: str = None) -> List[str]:
+    """Comma separated section names; empty means all. Raises ValueError on unknown ones."""
+    if not fields:
+        return list(FIELDS)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def _load(repo: DailyDataRepository, today: date, fields: Iterable[str]):
+    # Longest window per module, then one query per module
+    windows: Dict[str, int] = {}
+    for field in fields:
+        for module, days in FIELDS[field].items():
+            windows[module] = max(windows.get(module, 0), days)
+    by_days: Dict[int, List[str]] = {}
+    for module, days in windows.items():
+        by_days.setdefault(days, []).append(module)
+    for days, modules in by_days.items():
+        repo.load_range(today - timedelta(days=days - 1), today, modules)
+
+def build_today(db: Session, owner_id: int, fields: List[str]) -> schemas.DashboardToday:
+    now = datetime.now()
+    today = now.date()
+    wanted = set(fields)
+    result = {"date": str(today)}
+
+    # Same side effects as the single endpoints: close overdue sleep, provision today's logs
+    if "sleep" in wanted:
+        result["sleep"] = crud.check_and_fix_sleep_status(db, owner_id)
+    changed = []
+    if "sport_logs" in wanted and provisioning.ensure_sport_logs(db, owner_id, today):
+        changed.append(cache.SPORT)
+    if "mind_logs" in wanted and provisioning.ensure_mind_logs(db, owner_id, today):
+        changed.append(cache.MIND)
+    if changed:
+        rollups.refresh_day(db, owner_id, today)
+        db.commit()
+        resource_versions.bump(owner_id, *changed)
+
+    repo = DailyDataRepository(db, owner_id)
+    _load(repo, today, wanted)
+
+    if "work" in wanted:
+        works = repo.get_works(today, today)
+        result["work"] = schemas.WorkStatus(
+            active=any(w.type == "active" for w in works),
+            passive=any(w.type == "passive" for w in works),
+            is_saved=len(works) > 0,
+        )
+    if "balance" in wanted:
+        result["balance"] = crud.get_balance(db, owner_id)
+    if "finance_daily" in wanted:
+        finances = repo.get_finances(today, today)
+        result["finance_daily"] = schemas.DailyStat(
+            date=str(today),
+            total_income=sum(f.amount for f in finances if f.type in ["active_income", "passive_income"]),
+            total_expense=sum(f.amount for f in finances if f.type == "expense"),
+        )
+    if "habits" in wanted:
+        habits = repo.get_daily_habits(today, today)
+        result["habits"] = habits[0] if habits else None
+    # Types are loaded once and kept referenced, so each log's exercise_type /
+    # task_type resolves from the session's identity map instead of a query per log
+    types = []
+    if "sport_logs" in wanted:
+        types += crud.get_exercise_types(db, owner_id)
+        result["sport_logs"] = repo.get_sport_logs(today, today)
+    if "mind_logs" in wanted:
+        types += crud.get_mind_task_types(db, owner_id)
+        result["mind_logs"] = repo.get_mind_logs(today, today)
+
+    service = services.AnalyticsService(repo)
+    if "stats_work" in wanted:
+        result["stats_work"] = analytics_cache.get_or_compute(
+            owner_id, "stats/work", (), lambda: schemas.WorkStats(**service.get_work_stats()), db=db
+        )
+    if "stats_health" in wanted:
+        result["stats_health"] = analytics_cache.get_or_compute(
+            owner_id, "stats/health", (), lambda: schemas.HealthStats(**service.get_health_stats()), db=db
+        )
+    if "stats_mind" in wanted:
+        result["stats_mind"] = analytics_cache.get_or_compute(
+            owner_id, "stats/mind", (), lambda: schemas.MindStats(**service.get_mind_stats()), db=db
+        )
+    # Last: filling a missing rollup reloads the repository for that day only
+    if "discipline" in wanted:
+        calc = services.DisciplineCalculator(repo)
+        result["discipline"] = analytics_cache.get_or_compute(
+            owner_id, "discipline/today", (today,),
+            lambda: schemas.DisciplineScore(date=str(today), score=calc.calculate_daily_score(today)), db=db
+        )
+
+    return schemas.DashboardToday.model_validate(result, from_attributes=True)
@@ -0,0 +1,64 @@
+"""
+Stored Discipline Index history behind /analytics/discipline?from=&to=.
+
+A day's score and its per-component sub-scores are derived from the
+day's rollup and kept in discipline_scores. A range costs two queries:
+the rollups (rollups.get_range fills days without one in a single batched
+pass) and the stored scores. Only days without a score, or whose rollup
+was updated after their score was computed, are recomputed and written
+back; days in the future are computed but never stored.
+"""
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from datetime import date
+from typing import List
+import models, rollups, schemas
+from repositories import DailyDataRepository
+
+MAX_DAYS = 366
+
+def _day(day: date, score: float, components) -> schemas.DisciplineDay:
+    return schemas.DisciplineDay(date=str(day), score=score, **{k: round(v, 1) for k, v in components.items()})
+
+def get_range(repo: DailyDataRepository, start_date: date, end_date: date) -> List[schemas.DisciplineDay]:
+    db = repo.db
+    days = rollups.get_range(repo, start_date, end_date)
+    stored = {
+        s.date: s for s in db.query(models.DisciplineScore).filter(
+            models.DisciplineScore.owner_id == repo.owner_id,
+            models.DisciplineScore.date >= start_date,
+            models.DisciplineScore.date <= end_date
+        )
+    }
+
+    series = []
+    inserts, updates = [], []
+    for day in sorted(days):
+        rollup = days[day]
+        row = stored.get(day)
+        if row is not None and row.rollup_updated_at is not None and row.rollup_updated_at == rollup.updated_at:
+            series.append(_day(day, row.score, {name: getattr(row, name) for name in rollups.DISCIPLINE_WEIGHTS}))
+            continue
+
+        components = rollups.discipline_components({f: getattr(rollup, f) for f in rollups.ROLLUP_FIELDS})
+        series.append(_day(day, rollup.discipline_score, components))
+        if rollup.updated_at is None:
+            continue # Not a stored rollup (future day)
+        values = dict(components, score=rollup.discipline_score, rollup_updated_at=rollup.updated_at)
+        if row is None:
+            inserts.append(dict(values, owner_id=repo.owner_id, date=day))
+        else:
+            updates.append(dict(values, id=row.id))
+
+    # One executemany each, rather than a statement per row
+    if inserts or updates:
+        try:
+            if inserts:
+                db.execute(insert(models.DisciplineScore), inserts)
+            if updates:
+                db.execute(update(models.DisciplineScore), updates)
+            db.commit()
+        except IntegrityError:
+            # A concurrent request stored the same days first
+            db.rollback()
+    return series
@@ -0,0 +1,102 @@
+"""
+Weak ETags for read endpoints, answered with 304 before the route runs.
+
+A GET's tag is derived from the request path and query, today's date and
+the owner's version of every resource the response is built from: the
+seq of its latest entry in the change feed (changes.versions), written in
+the same transaction as the data. When If-None-Match carries the current
+tag the middleware answers 304 after that one indexed lookup, without
+running the route or serializing anything.
+
+The tag is computed before the route runs: a write racing with the
+request can only make the tag older than the body, never newer, so a
+client never keeps stale data under a current tag. Versions live in the
+database, so this holds across workers and restarts as well.
+"""
+import hashlib
+from datetime import datetime
+from typing import FrozenSet, Optional
+from starlette.concurrency import run_in_threadpool
+import cache, changes
+
+REFERENCE = {
+    "/finance/categories/": frozenset([cache.FINANCE_CATEGORIES]),
+    "/health/exercise-types/": frozenset([cache.EXERCISE_TYPES]),
+    "/mind/task-types/": frozenset([cache.MIND_TASK_TYPES]),
+}
+
+# path prefix -> resources; first match wins. Not listed (e.g. /health/sleep/today,
+# /dashboard/today, which close overdue sleep based on the clock) are never tagged.
+PREFIXES = [
+    ("/finance/balance", frozenset([cache.FINANCE])),
+    ("/finance/stats/", frozenset([cache.FINANCE])),
+    ("/work/today", frozenset([cache.WORK])),
+    ("/health/sport-logs", frozenset([cache.SPORT, cache.EXERCISE_TYPES])),
+    ("/health/habits/today", frozenset([cache.HABITS])),
+    ("/health/daily-habits-history", frozenset([cache.HABITS])),
+    ("/health/sleep-logs-history", frozenset([cache.SLEEP])),
+    ("/mind/logs/", frozenset([cache.MIND, cache.MIND_TASK_TYPES])),
+]
+
+def resources_for(path: str) -> Optional[FrozenSet[str]]:
+    if path in REFERENCE:
+        return REFERENCE[path]
+    if path == "/finance/":
+        return frozenset([cache.FINANCE, cache.FINANCE_CATEGORIES])
+    if path.startswith("/analytics/") and path != "/analytics/cache/stats":
+        try:
+            return cache.endpoint_modules(path[len("/analytics/"):])
+        except KeyError:
+            return None
+    for prefix, resources in PREFIXES:
+        if path.startswith(prefix):
+            return resources
+    return None
+
+def etag_for(owner_id: int, path: str, query: bytes, resources: FrozenSet[str]) -> str:
+    names = sorted(resources)
+    versions = changes.versions(owner_id, names)
+    key = f"{path}?{query.decode('latin-1')}|{datetime.now().date()}|{names}|{versions}"
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
+def _matches(if_none_match: str, tag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored
+    strip = lambda t: t.strip()[2:] if t.strip().startswith("W/") else t.strip()
+    return any(strip(t) == strip(tag) for t in if_none_match.split(","))
+
+class ETagMiddleware:
+    def __init__(self, app, owner_id: int):
+        self.app = app
+        self.owner_id = owner_id
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        resources = resources_for(scope["path"])
+        if not resources:
+            return await self.app(scope, receive, send)
+
+        # A database read; kept off the event loop
+        tag = await run_in_threadpool(etag_for, self.owner_id, scope["path"], scope.get("query_string", b""), resources)
+        headers = dict(scope["headers"])
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match and _matches(if_none_match.decode("latin-1"), tag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", tag.encode()), (b"cache-control", b"private, no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"etag", tag.encode()), (b"cache-control", b"private, no-cache"),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,95 @@
+"""
+Server-Sent Events push channel behind GET /events.
+
+Every committed write bumps the owner's resource versions (cache.py); the
+broker listens to those bumps and fans a "changed" event with the
+resource names out to every open /events stream of that owner, so the
+apps refetch (or read /sync/changes) only when something changed instead
+of polling.
+
+Writes commit on threadpool threads while streams wait on the event
+loop, so events are handed over with loop.call_soon_threadsafe. Like the
+analytics cache this is per process: with several workers a client only
+hears about writes served by its own worker.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from typing import AsyncIterator, Dict, Set, Tuple
+from cache import resource_versions
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+class Subscription:
+    def __init__(self, owner_id: int):
+        self.owner_id = owner_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def put(self, event: dict):
+        # Runs on the loop; a stream that fell behind loses its oldest events
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, owner_id: int) -> Subscription:
+        subscription = Subscription(owner_id)
+        with self._lock:
+            self._subscriptions.setdefault(owner_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.owner_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.owner_id, None)
+
+    def publish(self, owner_id: int, resources: Tuple[str, ...]):
+        """Safe to call from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(owner_id, ()))
+        if not subscriptions:
+            return
+        event = {"id": next(self._ids), "event": "changed", "data": {"resources": sorted(resources)}}
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError: # loop already closed
+                self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "owners": len(self._subscriptions),
+                "streams": sum(len(s) for s in self._subscriptions.values()),
+            }
+
+broker = Broker()
+resource_versions.listen(broker.publish)
+
+def _format(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+async def stream(owner_id: int, is_disconnected) -> AsyncIterator[str]:
+    """SSE text of the owner's events until the client goes away; comments keep idle connections open."""
+    subscription = broker.subscribe(owner_id)
+    try:
+        yield "retry: 3000\n\n"
+        while not await is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield _format(event)
+    finally:
+        broker.unsubscribe(subscription)
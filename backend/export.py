@@ -0,0 +1,103 @@
+"""
+Streaming export of all of an owner's rows as NDJSON or CSV.
+
+Rows are read as plain column tuples with yield_per (a server-side cursor
+where the driver has one) and written out batch by batch, so memory stays
+flat however much history there is. The generator opens its own session,
+it outlives the request handler.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional
+from sqlalchemy import select
+import database
+import models
+
+BATCH_ROWS = 1000
+
+TABLES = {
+    "finances": models.Finance,
+    "works": models.Work,
+    "sleep_logs": models.SleepLog,
+    "daily_habits": models.DailyHabit,
+    "sport_logs": models.SportLog,
+    "mind_logs": models.MindLog,
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _batches(owner_id: int, model) -> Iterator[tuple]:
+    # (column names, rows) per batch of BATCH_ROWS, in id order
+    columns = list(model.__table__.columns)
+    stmt = select(*columns).where(model.owner_id == owner_id).order_by(model.id)
+    db = database.SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=BATCH_ROWS))
+        names = [c.name for c in columns]
+        for rows in result.partitions():
+            yield names, rows
+    finally:
+        db.close()
+
+def ndjson(owner_id: int, tables: Iterable[str]) -> Iterator[bytes]:
+    """One JSON object per line; with several tables each line names its table."""
+    tables = list(tables)
+    tagged = len(tables) > 1
+    for table in tables:
+        for names, rows in _batches(owner_id, TABLES[table]):
+            lines = []
+            for row in rows:
+                record = {name: _plain(value) for name, value in zip(names, row)}
+                if tagged:
+                    record = {"table": table, **record}
+                lines.append(json.dumps(record, ensure_ascii=False))
+            yield ("\n".join(lines) + "\n").encode()
+
+def csv_rows(owner_id: int, table: str) -> Iterator[bytes]:
+    """CSV with a header row, one table per file."""
+    header_written = False
+    for names, rows in _batches(owner_id, TABLES[table]):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not header_written:
+            writer.writerow(names)
+            header_written = True
+        writer.writerows([_plain(v) for v in row] for row in rows)
+        yield buffer.getvalue().encode()
+    if not header_written:
+        # Empty table: still a valid CSV with its header
+        yield (",".join(c.name for c in TABLES[table].__table__.columns) + "\r\n").encode()
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream(owner_id: int, tables: List[str], fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    if fmt == "csv":
+        if len(tables) != 1:
+            raise ValueError("CSV export is one table at a time")
+        chunks = csv_rows(owner_id, tables[0])
+    elif fmt == "ndjson":
+        chunks = ndjson(owner_id, tables)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+    return gzipped(chunks) if gzip else chunks
+
+def filename(table: Optional[str], fmt: str, gzip: bool) -> str:
+    name = f"dayplan_{table or 'all'}_{datetime.now().date()}.{fmt}"
+    return name + ".gz" if gzip else name
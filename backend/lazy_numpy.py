@@ -0,0 +1,15 @@
+"""
+numpy for the vectorized code paths (correlations, the scoring engine).
+
+numpy is optional: it is imported on the first call to load(), so short
+requests that never need it don't pay for the import, and every caller
+falls back to pure Python when it is not installed.
+"""
+
+def load():
+    """numpy, imported on first use, or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
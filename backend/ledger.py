@@ -0,0 +1,133 @@
+"""
+Balance of an owner, computed from the finances ledger.
+
+balance = latest checkpoint + signed sum of the finance rows after it.
+A new checkpoint is written once CHECKPOINT_EVERY rows have piled up
+after the last one, so a read only ever sums a short tail.
+
+User.balance is kept as a cached copy, moved with an atomic
+UPDATE ... SET balance = balance + delta; reconcile() compares the two.
+
+Usage: python ledger.py [--fix] [owner_id ...]
+"""
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+import models
+
+CHECKPOINT_EVERY = 500
+
+INCOME_TYPES = ["active_income", "passive_income"]
+
+def delta(finance_type: str, amount: int) -> int:
+    """Signed effect of one finance row on the balance."""
+    if finance_type == "expense":
+        return -(amount or 0)
+    if finance_type in INCOME_TYPES:
+        return amount or 0
+    return 0
+
+_signed_amount = case(
+    (models.Finance.type == "expense", -models.Finance.amount),
+    (models.Finance.type.in_(INCOME_TYPES), models.Finance.amount),
+    else_=0,
+)
+
+def _latest_checkpoint(db: Session, owner_id: int) -> Optional[models.BalanceCheckpoint]:
+    return db.query(models.BalanceCheckpoint).filter(
+        models.BalanceCheckpoint.owner_id == owner_id
+    ).order_by(models.BalanceCheckpoint.finance_id.desc()).first()
+
+def _tail(db: Session, owner_id: int, after_id: int):
+    # (sum, row count, last id) of the rows after a checkpoint
+    return db.query(
+        func.coalesce(func.sum(_signed_amount), 0),
+        func.count(models.Finance.id),
+        func.max(models.Finance.id),
+    ).filter(
+        models.Finance.owner_id == owner_id,
+        models.Finance.id > after_id
+    ).one()
+
+def balance(db: Session, owner_id: int) -> int:
+    checkpoint = _latest_checkpoint(db, owner_id)
+    base, after_id = (checkpoint.balance, checkpoint.finance_id) if checkpoint else (0, 0)
+    total, _, _ = _tail(db, owner_id, after_id)
+    return base + int(total)
+
+def lock(db: Session, owner_id: int):
+    """
+    Takes the owner's row lock until the commit. Call before inserting finance
+    rows: ids are handed out at the insert, so without it a writer could
+    checkpoint past a lower id another transaction has not committed yet,
+    and that row would never be summed. SQLite serializes writers anyway.
+    """
+    db.query(models.User.id).filter(models.User.id == owner_id).with_for_update().scalar()
+
+def record(db: Session, owner_id: int, amount_delta: int):
+    """
+    Applies a balance change of a finance write: moves the cached User.balance
+    atomically and checkpoints the ledger when the tail got long.
+    Does not commit, the caller commits together with the finance row
+    (inserted after lock()).
+    """
+    if amount_delta:
+        db.execute(
+            update(models.User)
+            .where(models.User.id == owner_id)
+            .values(balance=func.coalesce(models.User.balance, 0) + amount_delta)
+        )
+    db.flush()
+    checkpoint = _latest_checkpoint(db, owner_id)
+    base, after_id = (checkpoint.balance, checkpoint.finance_id) if checkpoint else (0, 0)
+    total, count, last_id = _tail(db, owner_id, after_id)
+    if count >= CHECKPOINT_EVERY:
+        db.add(models.BalanceCheckpoint(owner_id=owner_id, finance_id=last_id, balance=base + int(total)))
+
+def forget_from(db: Session, owner_id: int, finance_id: int):
+    """
+    Drops the checkpoints that include a finance row which was changed or deleted.
+    The next read sums from the checkpoint before it.
+    """
+    db.query(models.BalanceCheckpoint).filter(
+        models.BalanceCheckpoint.owner_id == owner_id,
+        models.BalanceCheckpoint.finance_id >= finance_id
+    ).delete(synchronize_session=False)
+
+def reconcile(db: Session, owner_id: int, fix: bool = False) -> Dict[str, int]:
+    """
+    Compares the cached User.balance with the ledger.
+    With fix=True the cached value is overwritten with the ledger one.
+    """
+    cached = db.query(models.User.balance).filter(models.User.id == owner_id).scalar() or 0
+    total = db.query(func.coalesce(func.sum(_signed_amount), 0)).filter(
+        models.Finance.owner_id == owner_id
+    ).scalar()
+    ledger_balance = int(total)
+    # The checkpoints must agree with a full scan as well
+    if balance(db, owner_id) != ledger_balance:
+        forget_from(db, owner_id, 0)
+    if fix and cached != ledger_balance:
+        db.query(models.User).filter(models.User.id == owner_id).update(
+            {models.User.balance: ledger_balance}, synchronize_session=False
+        )
+    db.commit()
+    return {"owner_id": owner_id, "cached": cached, "ledger": ledger_balance, "drift": cached - ledger_balance}
+
+if __name__ == "__main__":
+    import sys
+    import database
+
+    args = sys.argv[1:]
+    fix = "--fix" in args
+    db = database.SessionLocal()
+    try:
+        owner_ids: List[int] = [int(a) for a in args if a != "--fix"]
+        if not owner_ids:
+            owner_ids = [u.id for u in db.query(models.User.id).all()]
+        for owner_id in owner_ids:
+            result = reconcile(db, owner_id, fix)
+            status = "ok" if not result["drift"] else ("fixed" if fix else "DRIFT")
+            print(f"Owner {owner_id}: cached {result['cached']} ledger {result['ledger']} ({status})")
+    finally:
+        db.close()
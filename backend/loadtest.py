@@ -0,0 +1,125 @@
+"""
+Compares request latency of the sync and async database modes.
+
+For each mode a uvicorn server is started on a migrated scratch copy
+of dayplan_v6.db, then the same mix of GET requests is fired with equal
+concurrency. Prints throughput and p50/p99 latency per mode.
+
+Usage: python loadtest.py [--requests N] [--concurrency C] [--threads T]
+  --threads caps Starlette's threadpool (the sync routes run in it)
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PATHS = [
+    "/finance/",
+    "/finance/balance",
+    "/finance/stats/daily",
+    "/work/today",
+    "/health/sport-logs/",
+    "/mind/logs/",
+    "/analytics/discipline/today",
+]
+
+SERVER = """
+import sys, anyio, uvicorn
+import migrations
+migrations.upgrade()
+import main
+
+async def serve(port, threads):
+    if threads:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    await uvicorn.Server(uvicorn.Config(main.app, port=port, log_level="warning")).serve()
+
+anyio.run(serve, int(sys.argv[1]), int(sys.argv[2]))
+"""
+
+def start_server(mode: str, port: int, threads: int, workdir: str) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, DAYPLAN_DB_MODE=mode)
+    return subprocess.Popen(
+        [sys.executable, "-c", SERVER, str(port), str(threads)],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+async def fire(base_url: str, total: int, concurrency: int):
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_ready(client)
+        for path in PATHS: # warm up caches and provisioning
+            await client.get(path)
+
+        queue = asyncio.Queue()
+        for i in range(total):
+            queue.put_nowait(PATHS[i % len(PATHS)])
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                path = queue.get_nowait()
+                t0 = time.perf_counter()
+                r = await client.get(path)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if r.status_code >= 500:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as workdir:
+            shutil.copy(os.path.join(BACKEND_DIR, "dayplan_v6.db"), workdir)
+            server = start_server(mode, args.port, args.threads, workdir)
+            try:
+                latencies, errors, elapsed = asyncio.run(
+                    fire(f"http://127.0.0.1:{args.port}", args.requests, args.concurrency)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+        print(
+            f"{mode:5}  {len(latencies) / elapsed:7.1f} req/s  "
+            f"p50 {statistics.median(latencies):7.1f} ms  "
+            f"p99 {percentile(latencies, 99):7.1f} ms  errors {errors}"
+        )
+
+if __name__ == "__main__":
+    main()
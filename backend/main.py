@@ -1,13 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import models, database, schemas, crud
-from datetime import date, datetime
+import models, database, schemas, crud, migrations
+from cache import analytics_cache
+import etag, metrics, scheduler
+import services, repositories, discipline, streaks
+import changes, dashboard, events, export, sync
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_event()
+    if scheduler.ENABLED:
+        scheduler.scheduler.start()
+    yield
+    await scheduler.scheduler.stop()
+
+app = FastAPI(title="DayPlan API", lifespan=lifespan)
 
-models.Base.metadata.create_all(bind=database.engine)
+# Temporary Hardcoded User ID for MVP
+MOCK_USER_ID = 1
+
+# Conditional GETs; added before CORS so CORS stays the outer layer and also covers 304s
+app.add_middleware(etag.ETagMiddleware, owner_id=MOCK_USER_ID)
 
-app = FastAPI(title="DayPlan API")
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 # Allow CORS for all origins (Development only)
 app.add_middleware(
@@ -17,8 +37,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Outermost, so latency includes every layer and 304s/CORS preflights are counted too
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Dependency
 def get_db():
     db = database.SessionLocal()
@@ -27,11 +51,17 @@ def get_db():
     finally:
         db.close()
 
-# Temporary Hardcoded User ID for MVP
-MOCK_USER_ID = 1
+if database.DB_MODE == "async":
+    # Registered first, so the async handlers shadow the sync ones below
+    import async_routes
+    app.include_router(async_routes.build_router(MOCK_USER_ID))
 
-@app.on_event("startup")
 def startup_event():
+    # Schema changes are applied by `python migrations.py upgrade`, never on boot
+    current, head = migrations.check()
+    if current < head:
+        print(f"WARNING: database schema is at version {current}, latest is {head}. Run: python migrations.py upgrade")
+
     # Create mock user if not exists
     db = database.SessionLocal()
     try:
@@ -95,15 +125,38 @@ def read_finance_categories(db: Session = Depends(get_db)):
 def create_finance_category(category: schemas.FinanceCategoryCreate, db: Session = Depends(get_db)):
     return crud.create_finance_category(db=db, category=category, owner_id=MOCK_USER_ID)
 
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    # List bodies stay plain arrays; the next page is announced in a header
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
 @app.get("/finance/", response_model=List[schemas.Finance])
-def read_finances(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Filter by today
+def read_finances(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    # Filter by today unless a range is given
     today = datetime.now().date()
-    return crud.get_finances(db, owner_id=MOCK_USER_ID, skip=skip, limit=limit, date=today)
+    if skip:
+        return crud.get_finances(db, owner_id=MOCK_USER_ID, skip=skip, limit=limit, date=today)
+    if not from_date and not to_date:
+        from_date = to_date = today
+    try:
+        rows, next_cursor = crud.get_finances_page(db, MOCK_USER_ID, limit, cursor, from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return rows
 
 @app.post("/finance/", response_model=schemas.Finance)
 def create_finance(finance: schemas.FinanceCreate, db: Session = Depends(get_db)):
-    return crud.create_finance(db=db, finance=finance, owner_id=MOCK_USER_ID)
+    db_finance = crud.create_finance(db=db, finance=finance, owner_id=MOCK_USER_ID)
+    return db_finance
 
 @app.put("/finance/{finance_id}", response_model=schemas.Finance)
 def update_finance(finance_id: int, finance: schemas.FinanceCreate, db: Session = Depends(get_db)):
@@ -112,14 +165,33 @@ def update_finance(finance_id: int, finance: schemas.FinanceCreate, db: Session
         raise HTTPException(status_code=404, detail="Finance record not found")
     return db_finance
 
+@app.delete("/finance/{finance_id}", response_model=schemas.Finance)
+def delete_finance(finance_id: int, db: Session = Depends(get_db)):
+    db_finance = crud.delete_finance(db, finance_id)
+    if not db_finance:
+        raise HTTPException(status_code=404, detail="Finance record not found")
+    return db_finance
+
 @app.get("/finance/balance")
 def read_balance(db: Session = Depends(get_db)):
     balance = crud.get_balance(db, owner_id=MOCK_USER_ID)
     return {"balance": balance}
 
 @app.get("/finance/stats/monthly", response_model=List[schemas.MonthlyStat])
-def read_monthly_stats(db: Session = Depends(get_db)):
-    return crud.get_monthly_stats(db, owner_id=MOCK_USER_ID)
+def read_monthly_stats(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    return crud.get_monthly_stats(db, owner_id=MOCK_USER_ID, start=from_date, end=to_date)
+
+@app.get("/finance/stats/monthly/breakdown", response_model=List[schemas.MonthlyBreakdown])
+def read_monthly_breakdown(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    return crud.get_monthly_breakdown(db, owner_id=MOCK_USER_ID, start=from_date, end=to_date)
 
 @app.get("/finance/stats/daily", response_model=schemas.DailyStat)
 def read_daily_stats(db: Session = Depends(get_db)):
@@ -132,7 +204,8 @@ def read_work_today(db: Session = Depends(get_db)):
 
 @app.put("/work/today", response_model=schemas.WorkStatus)
 def update_work_today(status: schemas.WorkStatus, db: Session = Depends(get_db)):
-    return crud.update_today_work_status(db, owner_id=MOCK_USER_ID, status=status)
+    work_status = crud.update_today_work_status(db, owner_id=MOCK_USER_ID, status=status)
+    return work_status
 
 # --- HEALTH ENDPOINTS ---
 @app.get("/health/exercise-types/", response_model=List[schemas.ExerciseType])
@@ -141,7 +214,8 @@ def read_exercise_types(db: Session = Depends(get_db)):
 
 @app.post("/health/exercise-types/", response_model=schemas.ExerciseType)
 def create_exercise_type(exercise: schemas.ExerciseTypeCreate, db: Session = Depends(get_db)):
-    return crud.create_exercise_type(db=db, exercise=exercise, owner_id=MOCK_USER_ID)
+    db_type = crud.create_exercise_type(db=db, exercise=exercise, owner_id=MOCK_USER_ID)
+    return db_type
 
 @app.put("/health/exercise-types/{type_id}", response_model=schemas.ExerciseType)
 def update_exercise_type(type_id: int, exercise: schemas.ExerciseTypeCreate, db: Session = Depends(get_db)):
@@ -158,7 +232,8 @@ def read_sport_logs(db: Session = Depends(get_db)):
 
 @app.post("/health/sport-logs/", response_model=schemas.SportLog)
 def create_sport_log(log: schemas.SportLogCreate, db: Session = Depends(get_db)):
-    return crud.create_sport_log(db=db, log=log, owner_id=MOCK_USER_ID)
+    db_log = crud.create_sport_log(db=db, log=log, owner_id=MOCK_USER_ID)
+    return db_log
 
 @app.put("/health/sport-logs/{log_id}", response_model=schemas.SportLog)
 def update_sport_log(log_id: int, log: schemas.SportLogCreate, db: Session = Depends(get_db)):
@@ -183,8 +258,20 @@ def get_sleep_log_today(db: Session = Depends(get_db)):
     return crud.get_sleep_log(db, owner_id=MOCK_USER_ID, date=today)
 
 @app.get("/health/sport-logs-history", response_model=List[schemas.SportLog])
-def get_sport_logs_history(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_sport_logs_history(db, owner_id=MOCK_USER_ID, limit=limit)
+def get_sport_logs_history(
+    response: Response,
+    limit: int = Query(100, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    try:
+        rows, next_cursor = crud.get_sport_logs_history(db, MOCK_USER_ID, limit, cursor, from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return rows
 
 @app.get("/health/habits/today", response_model=schemas.DailyHabit)
 def get_daily_habit_today(db: Session = Depends(get_db)):
@@ -198,7 +285,8 @@ def get_daily_habit_today(db: Session = Depends(get_db)):
 @app.post("/health/sleep/wake-up", response_model=Optional[schemas.SleepLog])
 def wake_up(db: Session = Depends(get_db)):
     # Returns updated (closed) sleep log, or None if just started day without sleep
-    return crud.wake_up_user(db, owner_id=MOCK_USER_ID)
+    log = crud.wake_up_user(db, owner_id=MOCK_USER_ID)
+    return log
 
 @app.post("/health/sleep/sleep", response_model=schemas.SleepLog)
 def sleep_user(db: Session = Depends(get_db)):
@@ -208,15 +296,40 @@ def sleep_user(db: Session = Depends(get_db)):
 @app.post("/health/habits/", response_model=schemas.DailyHabit)
 def update_daily_habit(habit: schemas.DailyHabitCreate, db: Session = Depends(get_db)):
     # This acts as create_or_update
-    return crud.update_daily_habit(db, habit, owner_id=MOCK_USER_ID)
+    db_habit = crud.update_daily_habit(db, habit, owner_id=MOCK_USER_ID)
+    return db_habit
 
 @app.get("/health/daily-habits-history", response_model=List[schemas.DailyHabit])
-def get_daily_habits_history(limit: int = 30, db: Session = Depends(get_db)):
-    return crud.get_daily_habits(db, owner_id=MOCK_USER_ID, limit=limit)
+def get_daily_habits_history(
+    response: Response,
+    limit: int = Query(30, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    try:
+        rows, next_cursor = crud.get_daily_habits(db, MOCK_USER_ID, limit, cursor, from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return rows
 
 @app.get("/health/sleep-logs-history", response_model=List[schemas.SleepLog])
-def get_sleep_logs_history(limit: int = 30, db: Session = Depends(get_db)):
-    return crud.get_sleep_logs_history(db, owner_id=MOCK_USER_ID, limit=limit)
+def get_sleep_logs_history(
+    response: Response,
+    limit: int = Query(30, ge=1, le=crud.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    try:
+        rows, next_cursor = crud.get_sleep_logs_history(db, MOCK_USER_ID, limit, cursor, from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_cursor(response, next_cursor)
+    return rows
 
 # --- MIND ENDPOINTS ---
 @app.get("/mind/task-types/", response_model=List[schemas.MindTaskType])
@@ -225,7 +338,8 @@ def read_mind_task_types(db: Session = Depends(get_db)):
 
 @app.post("/mind/task-types/", response_model=schemas.MindTaskType)
 def create_mind_task_type(task: schemas.MindTaskTypeCreate, db: Session = Depends(get_db)):
-    return crud.create_mind_task_type(db=db, task=task, owner_id=MOCK_USER_ID)
+    db_task = crud.create_mind_task_type(db=db, task=task, owner_id=MOCK_USER_ID)
+    return db_task
 
 @app.put("/mind/task-types/{type_id}", response_model=schemas.MindTaskType)
 def update_mind_task_type(type_id: int, task: schemas.MindTaskTypeCreate, db: Session = Depends(get_db)):
@@ -241,7 +355,8 @@ def read_mind_logs(db: Session = Depends(get_db)):
 
 @app.post("/mind/logs/", response_model=schemas.MindLog)
 def create_mind_log(log: schemas.MindLogCreate, db: Session = Depends(get_db)):
-    return crud.create_mind_log(db=db, log=log, owner_id=MOCK_USER_ID)
+    db_log = crud.create_mind_log(db=db, log=log, owner_id=MOCK_USER_ID)
+    return db_log
 
 @app.put("/mind/logs/{log_id}", response_model=schemas.MindLog)
 def update_mind_log(log_id: int, log: schemas.MindLogCreate, db: Session = Depends(get_db)):
@@ -258,10 +373,6 @@ def update_mind_log_status(log_id: int, is_completed: bool, db: Session = Depend
     return {"status": "success", "is_completed": log.is_completed}
 
 # --- ANALYTICS ---
-from typing import Optional
-from fastapi import Query
-import services, repositories
-
 def get_analytics_repo(db: Session = Depends(get_db)):
     return repositories.DailyDataRepository(db, MOCK_USER_ID)
 
@@ -278,48 +389,178 @@ def get_daily_discipline(
         except:
             pass
             
-    score = calc.calculate_daily_score(target_date)
-    return schemas.DisciplineScore(date=str(target_date), score=score)
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "discipline/today", (target_date,),
+        lambda: schemas.DisciplineScore(date=str(target_date), score=calc.calculate_daily_score(target_date)), db=repo.db
+    )
+
+@app.get("/analytics/discipline", response_model=schemas.DisciplineSeries)
+def get_discipline_series(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    repo: repositories.DailyDataRepository = Depends(get_analytics_repo)
+):
+    # Daily scores with sub-scores, default the last 30 days
+    end = to_date or datetime.now().date()
+    start = from_date or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    if (end - start).days + 1 > discipline.MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {discipline.MAX_DAYS} days")
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "discipline", (start, end),
+        lambda: schemas.DisciplineSeries(start=str(start), end=str(end), days=discipline.get_range(repo, start, end)), db=repo.db
+    )
+
+@app.get("/analytics/streaks", response_model=schemas.Streaks)
+def get_streaks(db: Session = Depends(get_db)):
+    # Current and longest run of active days per module, whole history
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "streaks", (), lambda: schemas.Streaks(**streaks.get_streaks(db, MOCK_USER_ID)), db=db
+    )
 
 @app.get("/analytics/correlations", response_model=schemas.CorrelationResponse)
-def get_correlations(repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
+def get_correlations(
+    days: int = Query(30, description="Window in days: 30, 90 or 365"),
+    repo: repositories.DailyDataRepository = Depends(get_analytics_repo)
+):
+    if days not in services.CORRELATION_WINDOWS:
+        raise HTTPException(status_code=400, detail="days must be one of 30, 90, 365")
     service = services.AnalyticsService(repo)
-    insights = service.get_correlations()
-    return schemas.CorrelationResponse(insights=insights)
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "correlations", (days,),
+        lambda: schemas.CorrelationResponse(window_days=days, **service.get_correlations(days)), db=repo.db
+    )
 
 @app.get("/analytics/finance-health", response_model=schemas.FinanceHealth)
 def get_finance_health(repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
     advisor = services.FinanceAdvisor(repo)
-    report = advisor.generate_report()
-    return schemas.FinanceHealth(**report)
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "finance-health", (),
+        lambda: schemas.FinanceHealth(**advisor.generate_report()), db=repo.db
+    )
     
 @app.get("/analytics/weekly-summary", response_model=schemas.WeeklySummary)
 def get_weekly_summary(repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
     reviewer = services.WeeklyReviewer(repo)
-    summary = reviewer.generate_summary()
-    return schemas.WeeklySummary(summary=summary)
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "weekly-summary", (),
+        lambda: schemas.WeeklySummary(summary=reviewer.generate_summary()), db=repo.db
+    )
 
 # --- STATS ---
 @app.get("/analytics/stats/work", response_model=schemas.WorkStats)
 def get_work_stats(repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
     service = services.AnalyticsService(repo)
-    return schemas.WorkStats(**service.get_work_stats())
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "stats/work", (),
+        lambda: schemas.WorkStats(**service.get_work_stats()), db=repo.db
+    )
 
 @app.get("/analytics/stats/health", response_model=schemas.HealthStats)
 def get_health_stats(repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
     service = services.AnalyticsService(repo)
-    return schemas.HealthStats(**service.get_health_stats())
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "stats/health", (),
+        lambda: schemas.HealthStats(**service.get_health_stats()), db=repo.db
+    )
 
 @app.get("/analytics/stats/mind", response_model=schemas.MindStats)
 def get_mind_stats(repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
     service = services.AnalyticsService(repo)
-    return schemas.MindStats(**service.get_mind_stats())
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, "stats/mind", (),
+        lambda: schemas.MindStats(**service.get_mind_stats()), db=repo.db
+    )
 
 @app.get("/analytics/history/{module}", response_model=schemas.DetailedStats)
 def get_detailed_history(module: str, repo: repositories.DailyDataRepository = Depends(get_analytics_repo)):
     service = services.AnalyticsService(repo)
     # Map friendly names to internal types if needed, but for now assuming frontend sends correct types
     # or handle validation
-    return schemas.DetailedStats(**service.get_detailed_stats(module))
-
-
+    return analytics_cache.get_or_compute(
+        MOCK_USER_ID, f"history/{module}", (),
+        lambda: schemas.DetailedStats(**service.get_detailed_stats(module)), db=repo.db
+    )
+
+# --- DASHBOARD ---
+@app.get("/dashboard/today", response_model=schemas.DashboardToday, response_model_exclude_unset=True)
+def get_dashboard_today(
+    fields: str = Query(None, description="Comma separated sections, e.g. work,balance,stats_work (default: all)"),
+    db: Session = Depends(get_db)
+):
+    try:
+        sections = dashboard.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return dashboard.build_today(db, MOCK_USER_ID, sections)
+
+# --- SYNC ---
+@app.post("/sync/batch", response_model=schemas.SyncBatchResult)
+def sync_batch(batch: schemas.SyncBatch, db: Session = Depends(get_db)):
+    # Offline-captured creates/updates in one transaction, idempotent per item key
+    if len(batch.items) > sync.MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {sync.MAX_ITEMS} items per batch")
+    results, _ = sync.apply_batch(db, MOCK_USER_ID, batch.items)
+    return schemas.SyncBatchResult(results=results, balance=crud.get_balance(db, MOCK_USER_ID))
+
+@app.get("/sync/changes", response_model=schemas.ChangeFeed)
+def sync_changes(
+    since: int = Query(0, description="version of the last feed page applied"),
+    limit: int = Query(changes.FEED_LIMIT, ge=1, le=changes.FEED_LIMIT),
+    db: Session = Depends(get_db)
+):
+    # Rows inserted, updated or deleted after `since`, across every module
+    entries, version, has_more = changes.since(db, MOCK_USER_ID, since, limit)
+    return schemas.ChangeFeed(version=version, has_more=has_more, changes=entries)
+
+# --- EVENTS ---
+@app.get("/events")
+async def stream_events(request: Request):
+    # Server-Sent Events: a "changed" event with the resource names after every committed write
+    return StreamingResponse(
+        events.stream(MOCK_USER_ID, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- EXPORT ---
+def export_response(tables: List[str], table: Optional[str], fmt: str, gzip: bool):
+    try:
+        chunks = export.stream(MOCK_USER_ID, tables, fmt, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    media_type = "application/gzip" if gzip else export.FORMATS[fmt]
+    headers = {"Content-Disposition": f'attachment; filename="{export.filename(table, fmt, gzip)}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@app.get("/export")
+def export_all(format: str = Query("ndjson", description="ndjson"), gzip: bool = False):
+    # Every table in one NDJSON stream, each line tagged with its table
+    return export_response(list(export.TABLES), None, format, gzip)
+
+@app.get("/export/{table}")
+def export_table(table: str, format: str = Query("ndjson", description="ndjson or csv"), gzip: bool = False):
+    if table not in export.TABLES:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    return export_response([table], table, format, gzip)
+
+@app.get("/scheduler/jobs")
+def get_scheduler_jobs():
+    # Last run, duration and outcome of each background job
+    return scheduler.scheduler.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus scrape target: per-route latency, queries per request, pool/cache/stream gauges
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/db/pool/stats")
+def get_db_pool_stats():
+    # Connection pool occupancy and checkout wait times
+    return database.pool_stats()
+
+@app.get("/analytics/cache/stats")
+def get_analytics_cache_stats():
+    # Hit/miss counters for tuning TTL and size
+    return analytics_cache.stats()
@@ -0,0 +1,216 @@
+"""
+Request latency and database query instrumentation, exposed at /metrics.
+
+MetricsMiddleware times every request per route template and opens a
+per-request tally; cursor events on every engine add each statement's
+count and duration to the tally of the request that ran it (it is kept in
+a ContextVar, which the threadpool and run_sync both carry along).
+
+At the end of a request:
+- latency, query count and DB time go into per-route histograms/counters
+- slower than DAYPLAN_SLOW_REQUEST_MS (500): logged with its slowest statements
+- more than DAYPLAN_N_PLUS_ONE_QUERIES (20) statements: logged with the most
+  repeated one, the usual sign of a query per row
+
+/metrics renders everything in the Prometheus text format, together with
+the connection pool, analytics cache, event stream and scheduler stats.
+Event streams (/events) are timed up to the start of the response.
+Like the other counters in this app it is per process.
+"""
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import cache, database, events, scheduler
+
+logger = logging.getLogger("dayplan.metrics")
+
+SLOW_REQUEST_MS = int(os.getenv("DAYPLAN_SLOW_REQUEST_MS", "500"))
+N_PLUS_ONE_QUERIES = int(os.getenv("DAYPLAN_N_PLUS_ONE_QUERIES", "20"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+MAX_STATEMENTS = 200 # Distinct statements remembered per request
+
+class RequestTally:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        # statement -> [count, seconds]
+        self.statements: Dict[str, List[float]] = {}
+
+    def add(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            if len(self.statements) >= MAX_STATEMENTS:
+                return
+            entry = self.statements[statement] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+_current: ContextVar[Optional[RequestTally]] = ContextVar("dayplan_request_tally", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    tally = _current.get()
+    if tally is not None:
+        tally.add(statement, time.perf_counter() - started)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = {}
+        self.slow_requests = 0
+        self.n_plus_one = 0
+
+    def record(self, method: str, route: str, status: int, seconds: float, tally: RequestTally):
+        with self._lock:
+            key = (method, route, str(status))
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.queries.setdefault((method, route), Histogram(QUERY_BUCKETS)).observe(tally.queries)
+            self.db_seconds[(method, route)] = self.db_seconds.get((method, route), 0.0) + tally.db_seconds
+
+        ms = seconds * 1000
+        if ms > SLOW_REQUEST_MS:
+            with self._lock:
+                self.slow_requests += 1
+            slowest = sorted(tally.statements.items(), key=lambda item: item[1][1], reverse=True)[:3]
+            logger.warning(
+                "Slow request %s %s: %.0f ms, %d queries, %.0f ms in the database%s",
+                method, route, ms, tally.queries, tally.db_seconds * 1000,
+                "".join(f"\n  {count}x {total * 1000:.1f} ms  {_short(sql)}" for sql, (count, total) in slowest),
+            )
+        if tally.queries > N_PLUS_ONE_QUERIES:
+            with self._lock:
+                self.n_plus_one += 1
+            sql, (count, total) = max(tally.statements.items(), key=lambda item: item[1][0])
+            logger.warning(
+                "Possible N+1 in %s %s: %d queries, %dx %s",
+                method, route, tally.queries, count, _short(sql),
+            )
+
+registry = Registry()
+
+def _short(sql: str, limit: int = 300) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= limit else sql[:limit] + " ..."
+
+def _route(scope) -> str:
+    # The route template keeps label values bounded; unmatched paths share one
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        tally = RequestTally()
+        token = _current.set(tally)
+        status = 500
+        started = time.perf_counter()
+        finished = None
+
+        async def send_with_status(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # An event stream stays open for the whole session; time it up to its start
+                if (b"content-type", b"text/event-stream") in [(k.lower(), v.split(b";")[0]) for k, v in message.get("headers", [])]:
+                    finished = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            seconds = (finished or time.perf_counter()) - started
+            registry.record(scope["method"], _route(scope), status, seconds, tally)
+
+# --- Prometheus text format ---
+
+def _labels(**labels) -> str:
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+def _histogram(lines: List[str], name: str, labels: Dict[str, str], histogram: Histogram):
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+def _gauges(lines: List[str], prefix: str, stats: Dict, kind: str = "gauge"):
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f"# TYPE {prefix}_{key} {kind}")
+        lines.append(f"{prefix}_{key} {value}")
+
+def render() -> str:
+    lines: List[str] = []
+    with registry._lock:
+        lines.append("# HELP dayplan_http_request_duration_seconds Request latency per route.")
+        lines.append("# TYPE dayplan_http_request_duration_seconds histogram")
+        for (method, route, status), histogram in sorted(registry.latency.items()):
+            _histogram(lines, "dayplan_http_request_duration_seconds",
+                       {"method": method, "route": route, "status": status}, histogram)
+
+        lines.append("# HELP dayplan_http_request_queries Database statements per request.")
+        lines.append("# TYPE dayplan_http_request_queries histogram")
+        for (method, route), histogram in sorted(registry.queries.items()):
+            _histogram(lines, "dayplan_http_request_queries", {"method": method, "route": route}, histogram)
+
+        lines.append("# HELP dayplan_http_request_db_seconds_total Time spent in database statements.")
+        lines.append("# TYPE dayplan_http_request_db_seconds_total counter")
+        for (method, route), seconds in sorted(registry.db_seconds.items()):
+            lines.append(f"dayplan_http_request_db_seconds_total{_labels(method=method, route=route)} {seconds}")
+
+        lines.append("# TYPE dayplan_slow_requests_total counter")
+        lines.append(f"dayplan_slow_requests_total {registry.slow_requests}")
+        lines.append("# TYPE dayplan_n_plus_one_requests_total counter")
+        lines.append(f"dayplan_n_plus_one_requests_total {registry.n_plus_one}")
+
+    _gauges(lines, "dayplan_db_pool", database.pool_stats())
+    _gauges(lines, "dayplan_analytics_cache", cache.analytics_cache.stats())
+    _gauges(lines, "dayplan_event_stream", events.broker.stats())
+
+    lines.append("# TYPE dayplan_scheduler_job_runs_total counter")
+    for job in scheduler.scheduler.stats():
+        lines.append(f"dayplan_scheduler_job_runs_total{_labels(job=job['name'])} {job['runs']}")
+    lines.append("# TYPE dayplan_scheduler_job_last_seconds gauge")
+    for job in scheduler.scheduler.stats():
+        if job["last_seconds"] is not None:
+            lines.append(f"dayplan_scheduler_job_last_seconds{_labels(job=job['name'])} {job['last_seconds']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,284 @@
+"""
+Versioned schema migrations for models.py.
+
+Applied versions are recorded in the schema_version table. Every step is
+idempotent (tables and indexes are created only when missing), so a
+database created before versioning, e.g. dayplan_v6.db, is brought up to
+date by simply running all of them. New schema changes get a new entry
+at the end of MIGRATIONS; never edit an applied one.
+
+Usage:
+  python migrations.py upgrade                     apply pending migrations
+  python migrations.py status                      show current and latest version
+  python migrations.py copy-from OLD.db [--batch-size N]
+                                                   copy an older dayplan_vN.db into
+                                                   a new, empty database, batch by batch
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table,
+    create_engine, func, insert, inspect, literal, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+import database
+import models
+
+version_table = Table(
+    "schema_version", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.now),
+)
+
+def _dedupe_daily_logs(table: str, type_column: str):
+    # Keep one log per (owner, type, day), preferring a completed one
+    def run(conn):
+        conn.execute(text(f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY owner_id, {type_column}, date(date)
+                        ORDER BY is_completed DESC, id
+                    ) AS rn
+                    FROM {table}
+                ) ranked WHERE rn > 1
+            )
+        """))
+    return run
+
+# index name -> data fix to run right before the index is created
+BEFORE_INDEX = {
+    "uq_sport_logs_owner_type_day": _dedupe_daily_logs("sport_logs", "exercise_type_id"),
+    "uq_mind_logs_owner_type_day": _dedupe_daily_logs("mind_logs", "task_type_id"),
+}
+
+def _index_names(conn, table_name: str) -> Set[str]:
+    # The inspector skips expression-based indexes, so ask the catalog directly
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        rows = conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t"
+        ), {"t": table_name})
+        return {r[0] for r in rows}
+    if dialect == "postgresql":
+        rows = conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :t"
+        ), {"t": table_name})
+        return {r[0] for r in rows}
+    return {ix["name"] for ix in inspect(conn).get_indexes(table_name)}
+
+def create_tables(*names: str) -> Callable[[Connection], None]:
+    def run(conn):
+        tables = [models.Base.metadata.tables[name] for name in names]
+        models.Base.metadata.create_all(bind=conn, tables=tables, checkfirst=True)
+    return run
+
+def create_indexes(*names: str) -> Callable[[Connection], None]:
+    def run(conn):
+        for table in models.Base.metadata.sorted_tables:
+            existing = _index_names(conn, table.name)
+            for index in table.indexes:
+                if index.name in names and index.name not in existing:
+                    if index.name in BEFORE_INDEX:
+                        BEFORE_INDEX[index.name](conn)
+                    index.create(bind=conn)
+    return run
+
+def _seed_change_feed(*names: str) -> Callable[[Connection], None]:
+    # An upsert entry for every existing row, so since=0 returns the full data set
+    def run(conn):
+        create_tables("changes")(conn)
+        feed = models.Base.metadata.tables["changes"]
+        if conn.execute(select(func.count()).select_from(feed)).scalar():
+            return
+        for name in names:
+            table = models.Base.metadata.tables[name]
+            rows = select(
+                table.c.owner_id, literal(name), table.c.id, literal("upsert"), literal(datetime.now())
+            ).where(table.c.owner_id.isnot(None)).order_by(table.c.id)
+            conn.execute(insert(feed).from_select(["owner_id", "resource", "row_id", "op", "created_at"], rows))
+    return run
+
+def _change_feed_sequence(conn):
+    # Per-owner feed sequence numbers, handed out under the owner's row lock (see changes.py)
+    for table, column, ddl in (("users", "change_seq", "INTEGER DEFAULT 0"), ("changes", "seq", "INTEGER")):
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    # Existing entries keep their id as seq, so the cursors clients hold stay valid
+    conn.execute(text("UPDATE changes SET seq = id WHERE seq IS NULL"))
+    conn.execute(text(
+        "UPDATE users SET change_seq = COALESCE((SELECT MAX(seq) FROM changes WHERE changes.owner_id = users.id), 0)"
+    ))
+    create_indexes("uq_changes_owner_seq")(conn)
+
+# (version, name, step), in order
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline tables", create_tables(
+        "users", "finance_categories", "finances", "works", "exercise_types",
+        "sleep_logs", "daily_habits", "sport_logs", "mind_task_types", "mind_logs",
+    )),
+    (2, "owner/date indexes", create_indexes(
+        "ix_finances_owner_date", "ix_works_owner_date", "ix_daily_habits_owner_date",
+        "ix_sport_logs_owner_date", "ix_mind_logs_owner_date", "ix_sleep_logs_owner_start_time",
+    )),
+    (3, "one sport/mind log per type and day", create_indexes(
+        "uq_sport_logs_owner_type_day", "uq_mind_logs_owner_type_day",
+    )),
+    (4, "daily rollups", create_tables("daily_rollups")),
+    (5, "balance checkpoints", create_tables("balance_checkpoints")),
+    (6, "sync idempotency keys", create_tables("sync_keys")),
+    (7, "change feed", _seed_change_feed(
+        "finance_categories", "exercise_types", "mind_task_types",
+        "finances", "works", "sleep_logs", "daily_habits", "sport_logs", "mind_logs",
+    )),
+    (8, "discipline score history", create_tables("discipline_scores")),
+    (9, "per-owner change feed sequence", _change_feed_sequence),
+    (10, "resource versions from the change feed", create_indexes("ix_changes_owner_resource_seq")),
+    (11, "persisted streaks", create_tables("streaks")),
+]
+
+HEAD = MIGRATIONS[-1][0]
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table(version_table.name):
+        return 0
+    return conn.execute(select(func.coalesce(func.max(version_table.c.version), 0))).scalar()
+
+def check(engine: Optional[Engine] = None) -> Tuple[int, int]:
+    """(current, latest) schema version of the database."""
+    engine = engine or database.engine
+    with engine.connect() as conn:
+        return current_version(conn), HEAD
+
+def upgrade(engine: Optional[Engine] = None, target: int = HEAD) -> List[int]:
+    """Applies pending migrations up to target, each in its own transaction."""
+    engine = engine or database.engine
+    applied = []
+    with engine.begin() as conn:
+        version_table.create(bind=conn, checkfirst=True)
+    for version, name, step in MIGRATIONS:
+        if version > target:
+            break
+        with engine.begin() as conn:
+            if current_version(conn) >= version:
+                continue
+            step(conn)
+            conn.execute(insert(version_table).values(version=version, name=name))
+        print(f"Applied {version}: {name}")
+        applied.append(version)
+    return applied
+
+# Derived from the copied rows, rebuilt afterwards rather than copied
+DERIVED_TABLES = {"changes", "balance_checkpoints", "daily_rollups", "discipline_scores", "streaks"}
+
+FEED_TABLES = (
+    "finance_categories", "exercise_types", "mind_task_types",
+    "finances", "works", "sleep_logs", "daily_habits", "sport_logs", "mind_logs",
+)
+
+def _has_data(engine: Engine) -> bool:
+    existing = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        return any(
+            conn.execute(select(table.c.id).limit(1)).first() is not None
+            for table in models.Base.metadata.sorted_tables if table.name in existing
+        )
+
+def copy_from(source_path: str, engine: Optional[Engine] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Copies every table of an older SQLite file into a new, empty database.
+
+    Rows are read in id order, batch_size at a time, and each batch is
+    written in its own short transaction, so neither side is loaded into
+    memory. Ids are kept, so the target must be empty: run it before the
+    app's first start, which seeds the mock user and categories. Only
+    columns known to both schemas are copied; new columns get their
+    defaults. Derived tables are skipped; the change feed is seeded from
+    the copied rows like migrations 7 and 9 do, rollups and balance
+    checkpoints are recomputed by rollups.py / ledger.py.
+    """
+    engine = engine or database.engine
+    if _has_data(engine):
+        raise ValueError("The target database already has data; copy into a new database before the app starts")
+    upgrade(engine)
+    source = create_engine(f"sqlite:///{os.path.abspath(source_path)}")
+    source_tables = set(inspect(source).get_table_names())
+    copied = {}
+
+    for table in models.Base.metadata.sorted_tables:
+        if table.name not in source_tables or table.name in DERIVED_TABLES:
+            continue
+        source_columns = {c["name"] for c in inspect(source).get_columns(table.name)}
+        columns = [c for c in table.columns if c.name in source_columns]
+        query = select(*columns).order_by(table.c.id).limit(batch_size)
+        stmt = _insert_ignore(engine, table)
+
+        copied[table.name] = 0
+        last_id = 0
+        while True:
+            with source.connect() as src:
+                rows = src.execute(query.where(table.c.id > last_id)).mappings().all()
+            if not rows:
+                break
+            with engine.begin() as conn:
+                result = conn.execute(stmt, [dict(row) for row in rows])
+            copied[table.name] += max(result.rowcount, 0)
+            last_id = rows[-1]["id"]
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Explicit ids do not move the id sequences
+            for name in copied:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE(MAX(id), 1)) FROM {name}"
+                ))
+        _seed_change_feed(*FEED_TABLES)(conn)
+        _change_feed_sequence(conn)
+
+    skipped = sorted(source_tables - set(models.Base.metadata.tables))
+    if skipped:
+        print(f"Not in the current schema, skipped: {', '.join(skipped)}")
+    source.dispose()
+    return copied
+
+def _insert_ignore(engine: Engine, table: Table):
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="migrations.py")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("upgrade")
+    commands.add_parser("status")
+    copy = commands.add_parser("copy-from")
+    copy.add_argument("source")
+    copy.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        current, head = check()
+        print(f"Schema version {current}, latest {head}")
+    elif args.command == "copy-from":
+        try:
+            copied = copy_from(args.source, batch_size=args.batch_size)
+        except ValueError as e:
+            parser.error(str(e))
+        for table, count in copied.items():
+            print(f"{table}: {count} rows copied")
+        print("Recompute derived data with: python rollups.py && python ledger.py --fix")
+    else:
+        if not upgrade():
+            print(f"Schema is up to date (version {HEAD})")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Time, Enum
+from sqlalchemy import func, Column, Integer, String, Float, DateTime, Date, ForeignKey, Boolean, Time, Enum, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -23,10 +23,12 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     full_name = Column(String)
     balance = Column(Integer, default=0)
+    change_seq = Column(Integer, default=0) # Last sequence number of the owner's change feed
     
     # Relationships
     finances = relationship("Finance", back_populates="owner")
     finance_categories = relationship("FinanceCategory", back_populates="owner")
+    balance_checkpoints = relationship("BalanceCheckpoint", back_populates="owner")
     
     works = relationship("Work", back_populates="owner")
     
@@ -40,6 +42,12 @@ class User(Base):
     mind_logs = relationship("MindLog", back_populates="owner")
     mind_task_types = relationship("MindTaskType", back_populates="owner")
 
+    daily_rollups = relationship("DailyRollup", back_populates="owner")
+    discipline_scores = relationship("DisciplineScore", back_populates="owner")
+    streaks = relationship("Streak", back_populates="owner")
+    sync_keys = relationship("SyncKey", back_populates="owner")
+    changes = relationship("Change", back_populates="owner")
+
 # --- FINANCE ---
 
 class FinanceCategory(Base):
@@ -54,6 +62,9 @@ class FinanceCategory(Base):
 
 class Finance(Base):
     __tablename__ = "finances"
+    __table_args__ = (
+        Index("ix_finances_owner_date", "owner_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Integer)
@@ -74,10 +85,31 @@ class Finance(Base):
 
     owner = relationship("User", back_populates="finances")
 
+class BalanceCheckpoint(Base):
+    """
+    Balance of an owner after every finance row up to finance_id.
+    The current balance is the latest checkpoint plus the rows after it (see ledger.py).
+    """
+    __tablename__ = "balance_checkpoints"
+    __table_args__ = (
+        Index("ix_balance_checkpoints_owner_finance", "owner_id", "finance_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    finance_id = Column(Integer, nullable=False) # Last finances.id included
+    balance = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.now)
+
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner = relationship("User", back_populates="balance_checkpoints")
+
 
 # 2. Ish (Work)
 class Work(Base):
     __tablename__ = "works"
+    __table_args__ = (
+        Index("ix_works_owner_date", "owner_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String) # "passive", "active"
@@ -106,6 +138,9 @@ class ExerciseType(Base):
 
 class SleepLog(Base):
     __tablename__ = "sleep_logs"
+    __table_args__ = (
+        Index("ix_sleep_logs_owner_start_time", "owner_id", "start_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -117,6 +152,9 @@ class SleepLog(Base):
 
 class DailyHabit(Base):
     __tablename__ = "daily_habits"
+    __table_args__ = (
+        Index("ix_daily_habits_owner_date", "owner_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, default=datetime.now)
@@ -129,6 +167,9 @@ class DailyHabit(Base):
 
 class SportLog(Base):
     __tablename__ = "sport_logs"
+    __table_args__ = (
+        Index("ix_sport_logs_owner_date", "owner_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     exercise_type_id = Column(Integer, ForeignKey("exercise_types.id"))
@@ -140,6 +181,13 @@ class SportLog(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="sport_logs")
 
+# One auto-provisioned log per exercise type and day (see provisioning.py)
+Index(
+    "uq_sport_logs_owner_type_day",
+    SportLog.owner_id, SportLog.exercise_type_id, func.date(SportLog.date),
+    unique=True,
+)
+
 
 # 4. Aql (Mind)
 
@@ -156,6 +204,9 @@ class MindTaskType(Base):
 
 class MindLog(Base):
     __tablename__ = "mind_logs"
+    __table_args__ = (
+        Index("ix_mind_logs_owner_date", "owner_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_type_id = Column(Integer, ForeignKey("mind_task_types.id"))
@@ -166,3 +217,139 @@ class MindLog(Base):
     
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="mind_logs")
+
+# One auto-provisioned log per task type and day (see provisioning.py)
+Index(
+    "uq_mind_logs_owner_type_day",
+    MindLog.owner_id, MindLog.task_type_id, func.date(MindLog.date),
+    unique=True,
+)
+
+
+# 5. Kunlik yig'indi (Daily Rollup)
+
+class DailyRollup(Base):
+    """
+    Per-day aggregates of every life module, one row per owner and day.
+    Kept up to date by the write paths in crud.py (see rollups.py).
+    """
+    __tablename__ = "daily_rollups"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "date", name="uq_daily_rollups_owner_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False)
+
+    work_planned = Column(Integer, default=0)
+    work_completed = Column(Integer, default=0)
+    mind_planned = Column(Integer, default=0)
+    mind_completed = Column(Integer, default=0)
+    sport_planned = Column(Integer, default=0)
+    sport_completed = Column(Integer, default=0)
+
+    sleep_hours = Column(Float, default=0.0) # Sleep that ended on this day
+    meal_count = Column(Integer, default=0)
+    morning_hygiene_done = Column(Boolean, default=False)
+
+    expense_total = Column(Integer, default=0)
+    income_total = Column(Integer, default=0) # active + passive
+
+    discipline_score = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner = relationship("User", back_populates="daily_rollups")
+
+class DisciplineScore(Base):
+    """
+    Discipline Index of one owner and day with its per-component sub-scores.
+    Derived from the day's rollup; stale once the rollup's updated_at moved
+    past rollup_updated_at (see discipline.py).
+    """
+    __tablename__ = "discipline_scores"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "date", name="uq_discipline_scores_owner_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False)
+
+    score = Column(Float, default=0.0)
+    sleep = Column(Float, default=0.0)
+    work = Column(Float, default=0.0)
+    mind = Column(Float, default=0.0)
+    sport = Column(Float, default=0.0)
+    habit = Column(Float, default=0.0)
+    rollup_updated_at = Column(DateTime, nullable=True) # Rollup version it was computed from
+
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner = relationship("User", back_populates="discipline_scores")
+
+class Streak(Base):
+    """
+    Latest run and longest run of active days of one owner and module.
+    Extended by rollups.refresh_day as days are written; a past-day edit
+    drops the row, and the next read recomputes it (see streaks.py).
+    """
+    __tablename__ = "streaks"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "module", name="uq_streaks_owner_module"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    module = Column(String, nullable=False) # work, sport, mind, habits
+    run_start = Column(Date, nullable=True) # First day of the latest run
+    last_day = Column(Date, nullable=True) # Latest active day
+    longest = Column(Integer, default=0)
+    longest_start = Column(Date, nullable=True)
+    longest_end = Column(Date, nullable=True)
+
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner = relationship("User", back_populates="streaks")
+
+
+
+# 6. Sinxronlash (Sync)
+
+class SyncKey(Base):
+    """
+    Idempotency key of an applied /sync/batch item and the row it produced,
+    so a replayed item answers with its first result instead of applying twice.
+    """
+    __tablename__ = "sync_keys"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "key", name="uq_sync_keys_owner_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False) # Client-generated
+    resource = Column(String, nullable=False) # finance, sport_log, mind_log, daily_habit
+    op = Column(String, nullable=False) # create, update
+    result_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner = relationship("User", back_populates="sync_keys")
+
+class Change(Base):
+    """
+    Change feed: one entry per row inserted, updated or deleted, in commit order.
+    seq is the per-owner sequence number clients pass back as /sync/changes?since= (see changes.py).
+    """
+    __tablename__ = "changes"
+    __table_args__ = (
+        Index("ix_changes_owner_id", "owner_id", "id"),
+        Index("uq_changes_owner_seq", "owner_id", "seq", unique=True),
+        Index("ix_changes_owner_resource_seq", "owner_id", "resource", "seq"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    seq = Column(Integer)
+    resource = Column(String, nullable=False) # Table name, e.g. finances
+    row_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False) # upsert, delete
+    created_at = Column(DateTime, default=datetime.now)
+
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner = relationship("User", back_populates="changes")
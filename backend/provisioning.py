@@ -0,0 +1,103 @@
+"""
+Daily auto-provisioning of SportLog / MindLog rows.
+
+Every tracked ExerciseType (and every active MindTaskType) gets one log row
+per day. Missing (type, day) pairs are found with a single anti-join and
+inserted with one INSERT ... SELECT; the unique (owner_id, type_id, day)
+indexes on the log tables make concurrent runs safe.
+"""
+import threading
+from sqlalchemy import exists, false, insert, literal, select, DateTime
+from sqlalchemy.orm import Session
+from datetime import date
+import models, changes, cache
+from repositories import day_bounds
+
+# (owner_id, kind, day) -> version of the types it was provisioned for, by this process.
+# A type added or toggled through any worker moves the version (changes.versions),
+# so the day is checked again. Today and later are kept (the scheduler provisions
+# tomorrow ahead), past days are dropped.
+_provisioned = {}
+_pruned_on = None
+_lock = threading.Lock()
+
+TYPE_RESOURCES = {"sport": cache.EXERCISE_TYPES, "mind": cache.MIND_TASK_TYPES}
+
+def _insert(db: Session, model):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(model)
+    return dialect_insert(model)
+
+def _is_provisioned(owner_id: int, kind: str, day: date, version: int) -> bool:
+    with _lock:
+        return _provisioned.get((owner_id, kind, day)) == version
+
+def _mark_provisioned(owner_id: int, kind: str, day: date, version: int):
+    global _pruned_on
+    with _lock:
+        today = date.today()
+        if _pruned_on != today:
+            for key in [key for key in _provisioned if key[2] < today]:
+                del _provisioned[key]
+            _pruned_on = today
+        _provisioned[(owner_id, kind, day)] = version
+
+def _provision(db: Session, owner_id: int, day: date, kind: str, log_model, log_type_column: str, type_model, type_filters) -> int:
+    version, = changes.versions(owner_id, [TYPE_RESOURCES[kind]], db)
+    if _is_provisioned(owner_id, kind, day, version):
+        return 0
+
+    day_start, next_day = day_bounds(day, day)
+    log_type_id = getattr(log_model, log_type_column)
+    missing = select(
+        type_model.id,
+        literal(day_start, DateTime()),
+        literal(owner_id),
+        false(),
+    ).where(
+        type_model.owner_id == owner_id,
+        *type_filters,
+        ~exists().where(
+            log_model.owner_id == owner_id,
+            log_type_id == type_model.id,
+            log_model.date >= day_start,
+            log_model.date < next_day,
+        ),
+    )
+    stmt = _insert(db, log_model).from_select(
+        [log_type_column, "date", "owner_id", "is_completed"], missing
+    )
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        stmt = stmt.on_conflict_do_nothing()
+    created = db.execute(stmt).rowcount or 0
+    if created:
+        changes.record_query(db, owner_id, log_model, log_model.date >= day_start, log_model.date < next_day)
+    _mark_provisioned(owner_id, kind, day, version)
+    return created
+
+def ensure_sport_logs(db: Session, owner_id: int, day: date) -> int:
+    """
+    Creates the missing SportLog of every ExerciseType for the day.
+    Returns the number of rows inserted; the caller commits.
+    """
+    return _provision(
+        db, owner_id, day, "sport",
+        models.SportLog, "exercise_type_id",
+        models.ExerciseType, [],
+    )
+
+def ensure_mind_logs(db: Session, owner_id: int, day: date) -> int:
+    """
+    Creates the missing MindLog of every active MindTaskType for the day.
+    Returns the number of rows inserted; the caller commits.
+    """
+    return _provision(
+        db, owner_id, day, "mind",
+        models.MindLog, "task_type_id",
+        models.MindTaskType, [models.MindTaskType.is_active == True],
+    )
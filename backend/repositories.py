@@ -1,52 +1,110 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
+from collections import defaultdict
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional
 import models
 
+def group_by_day(rows: Iterable[Any], day_of: Callable[[Any], Optional[date]]) -> Dict[date, List[Any]]:
+    """
+    Buckets rows by calendar day in a single pass.
+    day_of maps a row to its day; rows mapped to None are skipped.
+    """
+    buckets = defaultdict(list)
+    for row in rows:
+        day = day_of(row)
+        if day is not None:
+            buckets[day].append(row)
+    return buckets
+
+# module name -> (model, date column used for range filtering)
+MODULE_COLUMNS = {
+    "sleep_logs": (models.SleepLog, "start_time"),
+    "works": (models.Work, "date"),
+    "mind_logs": (models.MindLog, "date"),
+    "sport_logs": (models.SportLog, "date"),
+    "daily_habits": (models.DailyHabit, "date"),
+    "finances": (models.Finance, "date"),
+}
+
+def day_bounds(start_date: date, end_date: date):
+    """Half-open datetime window [start_date 00:00, end_date + 1 day 00:00)."""
+    return (
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+    )
+
 class DailyDataRepository:
     def __init__(self, db: Session, owner_id: int):
         self.db = db
         self.owner_id = owner_id
+        # module -> (start, end, rows bucketed by day), filled by load_range
+        self._snapshot = {}
 
-    def get_sleep_logs(self, start_date: date, end_date: date) -> List[models.SleepLog]:
-        return self.db.query(models.SleepLog).filter(
-            models.SleepLog.owner_id == self.owner_id,
-            models.SleepLog.start_time >= start_date,
-            models.SleepLog.start_time <= end_date + timedelta(days=1) # Include end date fully
+    def load_range(self, start_date: date, end_date: date, modules: Optional[Iterable[str]] = None) -> "DailyDataRepository":
+        """
+        Fetches every requested module for the whole window, one query per table.
+        Later get_* calls that fall inside the window are served from memory.
+        modules: names from MODULE_COLUMNS (default: all of them)
+        """
+        for module in modules or MODULE_COLUMNS:
+            model, column = MODULE_COLUMNS[module]
+            rows = self._query(module, start_date, end_date)
+            buckets = group_by_day(rows, lambda r: getattr(r, column).date())
+            self._snapshot[module] = (start_date, end_date, buckets)
+        return self
+
+    def _window(self, module: str, start_date: date, end_date: date):
+        model, column = MODULE_COLUMNS[module]
+        lo, hi = day_bounds(start_date, end_date)
+        col = getattr(model, column)
+        return (model.owner_id == self.owner_id, col >= lo, col < hi)
+
+    def _query(self, module: str, start_date: date, end_date: date) -> List[Any]:
+        model, _ = MODULE_COLUMNS[module]
+        return self.db.query(model).filter(*self._window(module, start_date, end_date)).all()
+
+    def get_columns(self, module: str, columns: List[str], start_date: date, end_date: date) -> List[tuple]:
+        """
+        Plain tuples of the selected columns for the window, without building
+        ORM objects. Meant for loading straight into columnar frames.
+        """
+        model, _ = MODULE_COLUMNS[module]
+        return self.db.query(*[getattr(model, c) for c in columns]).filter(
+            *self._window(module, start_date, end_date)
         ).all()
 
+    def _rows(self, module: str, start_date: date, end_date: date) -> List[Any]:
+        snapshot = self._snapshot.get(module)
+        if snapshot and snapshot[0] <= start_date and end_date <= snapshot[1]:
+            buckets = snapshot[2]
+            rows = []
+            for i in range((end_date - start_date).days + 1):
+                rows.extend(buckets.get(start_date + timedelta(days=i), []))
+            return rows
+        return self._query(module, start_date, end_date)
+
+    def get_sleep_logs(self, start_date: date, end_date: date) -> List[models.SleepLog]:
+        return self._rows("sleep_logs", start_date, end_date)
+
     def get_works(self, start_date: date, end_date: date) -> List[models.Work]:
-        return self.db.query(models.Work).filter(
-            models.Work.owner_id == self.owner_id,
-            models.Work.date >= start_date,
-            models.Work.date <= end_date + timedelta(days=1)
-        ).all()
+        return self._rows("works", start_date, end_date)
         
     def get_mind_logs(self, start_date: date, end_date: date) -> List[models.MindLog]:
-        return self.db.query(models.MindLog).filter(
-            models.MindLog.owner_id == self.owner_id,
-            models.MindLog.date >= start_date,
-            models.MindLog.date <= end_date + timedelta(days=1)
-        ).all()
+        return self._rows("mind_logs", start_date, end_date)
         
     def get_sport_logs(self, start_date: date, end_date: date) -> List[models.SportLog]:
-        return self.db.query(models.SportLog).filter(
-            models.SportLog.owner_id == self.owner_id,
-            models.SportLog.date >= start_date,
-            models.SportLog.date <= end_date + timedelta(days=1)
-        ).all()
+        return self._rows("sport_logs", start_date, end_date)
         
     def get_daily_habits(self, start_date: date, end_date: date) -> List[models.DailyHabit]:
-        return self.db.query(models.DailyHabit).filter(
-            models.DailyHabit.owner_id == self.owner_id,
-            models.DailyHabit.date >= start_date,
-            models.DailyHabit.date <= end_date + timedelta(days=1)
-        ).all()
+        return self._rows("daily_habits", start_date, end_date)
 
     def get_finances(self, start_date: date, end_date: date) -> List[models.Finance]:
-        return self.db.query(models.Finance).filter(
-            models.Finance.owner_id == self.owner_id,
-            models.Finance.date >= start_date,
-            models.Finance.date <= end_date + timedelta(days=1)
+        return self._rows("finances", start_date, end_date)
+
+    def get_rollups(self, start_date: date, end_date: date) -> List[models.DailyRollup]:
+        return self.db.query(models.DailyRollup).filter(
+            models.DailyRollup.owner_id == self.owner_id,
+            models.DailyRollup.date >= start_date,
+            models.DailyRollup.date <= end_date
         ).all()
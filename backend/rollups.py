@@ -0,0 +1,232 @@
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from repositories import DailyDataRepository, group_by_day
+import models, streaks
+
+# Aggregate columns of models.DailyRollup (everything except keys/timestamps)
+ROLLUP_FIELDS = [
+    "work_planned", "work_completed",
+    "mind_planned", "mind_completed",
+    "sport_planned", "sport_completed",
+    "sleep_hours", "meal_count", "morning_hygiene_done",
+    "expense_total", "income_total",
+    "discipline_score",
+]
+
+REBUILD_CHUNK_DAYS = 90
+
+# Discipline component -> weight in the index
+DISCIPLINE_WEIGHTS = {
+    "sleep": 0.20,
+    "work": 0.30,
+    "mind": 0.25,
+    "sport": 0.15,
+    "habit": 0.10,
+}
+
+SLEEP_TARGET_HOURS = 8.0
+MEAL_TARGET = 3
+SCORE_DECIMALS = 1
+
+def discipline_components(totals: Dict[str, Any], sleep_target_hours: float = SLEEP_TARGET_HOURS,
+                          meal_target: int = MEAL_TARGET) -> Dict[str, float]:
+    """Sub-scores (0-100 each) of one day's Discipline Index, from its rollup totals."""
+    # Simple linear for MVP: min(hours / target, 1) * 100
+    sleep_score = min(totals["sleep_hours"] / sleep_target_hours, 1.0) * 100
+
+    work_score = 0
+    if totals["work_planned"]:
+        work_score = (totals["work_completed"] / totals["work_planned"]) * 100
+
+    mind_score = 0
+    if totals["mind_planned"]:
+        mind_score = (totals["mind_completed"] / totals["mind_planned"]) * 100
+
+    # Any sport done is good
+    sport_score = 100 if totals["sport_completed"] > 0 else 0
+
+    # Meals: meal_target meals = 50 pts.
+    hygiene_points = 50 if totals["morning_hygiene_done"] else 0
+    meal_points = min(totals["meal_count"] / float(meal_target), 1.0) * 50
+    habit_score = hygiene_points + meal_points
+
+    return {"sleep": sleep_score, "work": work_score, "mind": mind_score, "sport": sport_score, "habit": habit_score}
+
+def discipline_score(totals: Dict[str, Any]) -> float:
+    """
+    Discipline Index (0-100) of one day from its rollup totals.
+    Weights:
+    - Sleep: 20% (Target 8h)
+    - Work: 30% (Completion Rate)
+    - Mind: 25% (Completion Rate)
+    - Sport: 15% (Done or not)
+    - Habits: 10% (Hygiene + Meals)
+    """
+    return weighted_score(discipline_components(totals), DISCIPLINE_WEIGHTS)
+
+def round_score(total: float) -> float:
+    return round(total, SCORE_DECIMALS)
+
+def weighted_score(components: Dict[str, float], weights: Dict[str, float]) -> float:
+    """Weighted sum of the components, added in the order of weights, rounded."""
+    return round_score(sum(components[name] * weight for name, weight in weights.items()))
+
+def summarize_days(repo: DailyDataRepository, start_date: date, end_date: date) -> Dict[date, Dict[str, Any]]:
+    """
+    Builds rollup totals for every day in [start_date, end_date] from raw rows.
+    Each table is fetched once for the whole range and bucketed by day.
+    """
+    works = group_by_day(repo.get_works(start_date, end_date), lambda w: w.date.date())
+    minds = group_by_day(repo.get_mind_logs(start_date, end_date), lambda m: m.date.date())
+    sports = group_by_day(repo.get_sport_logs(start_date, end_date), lambda s: s.date.date())
+    habits = group_by_day(repo.get_daily_habits(start_date, end_date), lambda h: h.date.date())
+    finances = group_by_day(repo.get_finances(start_date, end_date), lambda f: f.date.date())
+    # Sleep is credited to the wake-up day, so include nights that started the day before
+    sleeps = group_by_day(
+        repo.get_sleep_logs(start_date - timedelta(days=1), end_date),
+        lambda s: s.end_time.date() if s.end_time else None
+    )
+
+    result = {}
+    for i in range((end_date - start_date).days + 1):
+        day = start_date + timedelta(days=i)
+        d_works = works.get(day, [])
+        d_minds = minds.get(day, [])
+        d_sports = sports.get(day, [])
+        d_habits = habits.get(day, [])
+        d_finances = finances.get(day, [])
+        habit = d_habits[0] if d_habits else None # Assume 1 per day
+
+        totals = {
+            "work_planned": len(d_works),
+            "work_completed": sum(1 for w in d_works if w.is_completed),
+            "mind_planned": len(d_minds),
+            "mind_completed": sum(1 for m in d_minds if m.is_completed),
+            "sport_planned": len(d_sports),
+            "sport_completed": sum(1 for s in d_sports if s.is_completed),
+            "sleep_hours": sum((s.end_time - s.start_time).total_seconds() / 3600 for s in sleeps.get(day, [])),
+            "meal_count": (habit.meal_count or 0) if habit else 0,
+            "morning_hygiene_done": bool(habit.morning_hygiene_done) if habit else False,
+            "expense_total": sum(f.amount for f in d_finances if f.type == "expense"),
+            "income_total": sum(f.amount for f in d_finances if f.type in ["active_income", "passive_income"]),
+        }
+        totals["discipline_score"] = discipline_score(totals)
+        result[day] = totals
+    return result
+
+def _store(db: Session, owner_id: int, day: date, totals: Dict[str, Any], row: Optional[models.DailyRollup] = None):
+    if row is None:
+        row = models.DailyRollup(owner_id=owner_id, date=day)
+        db.add(row)
+    for key in ROLLUP_FIELDS:
+        setattr(row, key, totals[key])
+    return row
+
+def refresh_day(db: Session, owner_id: int, day: date):
+    """
+    Recomputes one day's rollup after a write touching that day, and moves
+    the owner's stored streaks along (streaks.apply_day).
+    Flushes pending changes but does not commit, so the rollup lands
+    in the same transaction as the write that caused it.
+    """
+    db.flush()
+    repo = DailyDataRepository(db, owner_id)
+    totals = summarize_days(repo, day, day)[day]
+    row = db.query(models.DailyRollup).filter(
+        models.DailyRollup.owner_id == owner_id,
+        models.DailyRollup.date == day
+    ).first()
+    before = streaks.active_modules({f: getattr(row, f) for f in ROLLUP_FIELDS}) if row is not None else None
+    row = _store(db, owner_id, day, totals, row)
+    streaks.apply_day(db, owner_id, day, before, streaks.active_modules(totals))
+    return row
+
+def get_range(repo: DailyDataRepository, start_date: date, end_date: date) -> Dict[date, models.DailyRollup]:
+    """
+    Returns rollups for every day in the range, one row per day.
+    Days without a stored rollup (history before rollups existed) are
+    computed in one batched pass and persisted, so later reads are O(days).
+    """
+    rows = {r.date: r for r in repo.get_rollups(start_date, end_date)}
+    missing = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    missing = [d for d in missing if d not in rows]
+    if not missing:
+        return rows
+
+    # One query per table for the whole gap, including the night before it
+    repo.load_range(missing[0] - timedelta(days=1), missing[-1])
+    totals = summarize_days(repo, missing[0], missing[-1])
+    today = datetime.now().date()
+    # Never persist the future, the day is not over yet; one executemany for the rest
+    new_rows = [
+        dict({key: totals[day][key] for key in ROLLUP_FIELDS}, owner_id=repo.owner_id, date=day)
+        for day in missing if day <= today
+    ]
+    try:
+        if new_rows:
+            repo.db.execute(insert(models.DailyRollup), new_rows)
+        repo.db.commit()
+    except IntegrityError:
+        # A concurrent request filled the same days first
+        repo.db.rollback()
+    # Reload in one query rather than refreshing each expired row on access
+    rows = {r.date: r for r in repo.get_rollups(start_date, end_date)}
+    for day in missing:
+        if day not in rows:
+            rows[day] = models.DailyRollup(owner_id=repo.owner_id, date=day, **totals[day])
+    return rows
+
+def _first_day(db: Session, owner_id: int) -> Optional[date]:
+    candidates = [
+        db.query(func.min(models.Work.date)).filter(models.Work.owner_id == owner_id).scalar(),
+        db.query(func.min(models.MindLog.date)).filter(models.MindLog.owner_id == owner_id).scalar(),
+        db.query(func.min(models.SportLog.date)).filter(models.SportLog.owner_id == owner_id).scalar(),
+        db.query(func.min(models.DailyHabit.date)).filter(models.DailyHabit.owner_id == owner_id).scalar(),
+        db.query(func.min(models.Finance.date)).filter(models.Finance.owner_id == owner_id).scalar(),
+        db.query(func.min(models.SleepLog.start_time)).filter(models.SleepLog.owner_id == owner_id).scalar(),
+    ]
+    candidates = [c.date() if isinstance(c, datetime) else c for c in candidates if c]
+    return min(candidates) if candidates else None
+
+def rebuild(db: Session, owner_id: int) -> int:
+    """
+    Recomputes every rollup of an owner from raw rows, chunk by chunk.
+    Returns the number of days written.
+    """
+    first = _first_day(db, owner_id)
+    if first is None:
+        return 0
+    today = datetime.now().date()
+    repo = DailyDataRepository(db, owner_id)
+
+    written = 0
+    chunk_start = first
+    while chunk_start <= today:
+        chunk_end = min(chunk_start + timedelta(days=REBUILD_CHUNK_DAYS - 1), today)
+        totals = summarize_days(repo, chunk_start, chunk_end)
+        existing = {r.date: r for r in repo.get_rollups(chunk_start, chunk_end)}
+        for day, day_totals in totals.items():
+            _store(db, owner_id, day, day_totals, existing.get(day))
+        db.commit()
+        written += len(totals)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+if __name__ == "__main__":
+    # Backfill: python rollups.py [owner_id ...]
+    import sys
+    import database
+
+    db = database.SessionLocal()
+    try:
+        owner_ids: List[int] = [int(a) for a in sys.argv[1:]]
+        if not owner_ids:
+            owner_ids = [u.id for u in db.query(models.User.id).all()]
+        for owner_id in owner_ids:
+            days = rebuild(db, owner_id)
+            print(f"Owner {owner_id}: {days} days rebuilt")
+    finally:
+        db.close()
@@ -0,0 +1,193 @@
+"""
+In-process scheduler for the time-driven work that used to wait for a request.
+
+Started and stopped by the app's lifespan (main.py). Jobs run one at a
+time in a worker thread, so the event loop keeps serving requests, and
+walk all owners in batches with one transaction per batch:
+
+- close_overdue_sleeps   every 5 minutes: sleeps still open after
+                         crud.MAX_SLEEP_HOURS are closed, as
+                         /health/sleep/today would do
+- provision_upcoming     23:30: today's and tomorrow's SportLog/MindLog rows
+- precompute_yesterday   00:05: yesterday's rollups, discipline score included
+
+Every job also runs once at startup, to catch up after downtime. All of
+them are idempotent, so running several workers (each with its own
+scheduler) is safe; set DAYPLAN_SCHEDULER=0 to keep one out of it.
+"""
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import cache, crud, database, models, provisioning, rollups
+from cache import resource_versions
+
+ENABLED = os.getenv("DAYPLAN_SCHEDULER", "1") != "0"
+
+OWNER_BATCH = 100
+SLEEP_BATCH = 500
+MAX_SLEEP_SECONDS = 60 # Upper bound of one wait, so clock jumps are picked up
+
+def owner_batches(db) -> Iterator[List[int]]:
+    last_id = 0
+    while True:
+        ids = [row.id for row in db.query(models.User.id).filter(models.User.id > last_id)
+               .order_by(models.User.id).limit(OWNER_BATCH)]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+def close_overdue_sleeps() -> int:
+    db = database.SessionLocal()
+    try:
+        cutoff = datetime.now() - timedelta(hours=crud.MAX_SLEEP_HOURS)
+        closed = 0
+        last_id = 0
+        while True:
+            logs = db.query(models.SleepLog).filter(
+                models.SleepLog.end_time == None,
+                models.SleepLog.start_time < cutoff,
+                models.SleepLog.id > last_id
+            ).order_by(models.SleepLog.id).limit(SLEEP_BATCH).all()
+            if not logs:
+                return closed
+            days = set()
+            for log in logs:
+                log.end_time = log.start_time + timedelta(hours=crud.MAX_SLEEP_HOURS)
+                days.add((log.owner_id, log.end_time.date()))
+            for owner_id, day in sorted(days):
+                rollups.refresh_day(db, owner_id, day)
+            db.commit()
+            for owner_id in {owner_id for owner_id, _ in days}:
+                resource_versions.bump(owner_id, cache.SLEEP)
+            closed += len(logs)
+            last_id = logs[-1].id
+    finally:
+        db.close()
+
+def provision_days(days: List[date]) -> int:
+    db = database.SessionLocal()
+    try:
+        created = 0
+        today = datetime.now().date()
+        for owner_ids in owner_batches(db):
+            changed = {}
+            for owner_id in owner_ids:
+                for day in days:
+                    sport = provisioning.ensure_sport_logs(db, owner_id, day)
+                    mind = provisioning.ensure_mind_logs(db, owner_id, day)
+                    if sport:
+                        changed.setdefault(owner_id, set()).add(cache.SPORT)
+                    if mind:
+                        changed.setdefault(owner_id, set()).add(cache.MIND)
+                    # Never persist a rollup for a day that has not happened yet
+                    if (sport or mind) and day <= today:
+                        rollups.refresh_day(db, owner_id, day)
+                    created += sport + mind
+            db.commit()
+            for owner_id, modules in changed.items():
+                resource_versions.bump(owner_id, *modules)
+        return created
+    finally:
+        db.close()
+
+def provision_upcoming() -> int:
+    today = datetime.now().date()
+    return provision_days([today, today + timedelta(days=1)])
+
+def precompute_yesterday() -> int:
+    """Recomputes yesterday's rollup of every owner now that the day is over."""
+    yesterday = datetime.now().date() - timedelta(days=1)
+    db = database.SessionLocal()
+    try:
+        done = 0
+        for owner_ids in owner_batches(db):
+            for owner_id in owner_ids:
+                rollups.refresh_day(db, owner_id, yesterday)
+            db.commit()
+            done += len(owner_ids)
+        return done
+    finally:
+        db.close()
+
+class Job:
+    def __init__(self, name: str, fn: Callable[[], Any], every: Optional[timedelta] = None, at: Optional[clock] = None):
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.at = at
+        self.runs = 0
+        self.last_run: Optional[datetime] = None
+        self.last_seconds: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+
+    def next_run(self, now: datetime) -> datetime:
+        if self.every:
+            return now + self.every
+        run = datetime.combine(now.date(), self.at)
+        return run if run > now else run + timedelta(days=1)
+
+    def execute(self):
+        started = time.perf_counter()
+        self.last_run = datetime.now()
+        try:
+            self.last_result = self.fn()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = repr(e)
+            print(f"Scheduler job {self.name} failed: {e!r}")
+        self.runs += 1
+        self.last_seconds = round(time.perf_counter() - started, 3)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "runs": self.runs,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_seconds": self.last_seconds,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+class Scheduler:
+    def __init__(self, jobs: List[Job]):
+        self.jobs = jobs
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        # Everything is due at startup, then on its own schedule
+        due = {job: datetime.now() for job in self.jobs}
+        while True:
+            job = min(self.jobs, key=lambda j: due[j])
+            delay = (due[job] - datetime.now()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, MAX_SLEEP_SECONDS))
+                continue
+            await asyncio.to_thread(job.execute)
+            due[job] = job.next_run(datetime.now())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [job.stats() for job in self.jobs]
+
+scheduler = Scheduler([
+    Job("close_overdue_sleeps", close_overdue_sleeps, every=timedelta(minutes=5)),
+    Job("provision_upcoming", provision_upcoming, at=clock(23, 30)),
+    Job("precompute_yesterday", precompute_yesterday, at=clock(0, 5)),
+])
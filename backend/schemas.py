@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from datetime import datetime
 
 # --- PULL (FINANCE) ---
@@ -41,6 +41,14 @@ class MonthlyStat(BaseModel):
     total_income: float
     total_expense: float
 
+class MonthlyBreakdown(BaseModel):
+    month: str # "YYYY-MM"
+    type: str # active_income, passive_income, expense
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    total: float
+    count: int
+
 class DailyStat(BaseModel):
     date: str # "YYYY-MM-DD"
     total_income: float
@@ -72,8 +80,26 @@ class DisciplineScore(BaseModel):
     date: str
     score: float
 
+class DisciplineDay(BaseModel):
+    date: str # "YYYY-MM-DD"
+    score: float
+    # Sub-scores, 0-100 each; see rollups.DISCIPLINE_WEIGHTS
+    sleep: float
+    work: float
+    mind: float
+    sport: float
+    habit: float
+
+class DisciplineSeries(BaseModel):
+    start: str
+    end: str
+    days: List[DisciplineDay]
+
 class CorrelationResponse(BaseModel):
     insights: Dict[str, str]
+    window_days: int = 30
+    # metric -> metric -> Pearson coefficient (None if a series is constant)
+    coefficients: Dict[str, Dict[str, Optional[float]]] = {}
 
 class FinanceHealth(BaseModel):
     burn_rate_daily: float
@@ -89,6 +115,18 @@ class WorkStats(BaseModel):
     total_completed: int
     motivation_message: str
 
+class Streak(BaseModel):
+    current: int # Days, up to today (or yesterday while today is open)
+    longest: int
+    longest_start: Optional[str] = None # "YYYY-MM-DD"
+    longest_end: Optional[str] = None
+
+class Streaks(BaseModel):
+    work: Streak
+    sport: Streak
+    mind: Streak
+    habits: Streak
+
 class HealthStats(BaseModel):
     avg_sleep_hours: float
     sport_days_weekly: int
@@ -236,3 +274,53 @@ class DailyReport(BaseModel):
     daily_habit: Optional[DailyHabit] = None
     sport_logs: List[SportLog] = []
     mind_logs: List[MindLog] = []
+
+# --- DASHBOARD ---
+class DashboardToday(BaseModel):
+    # Only the sections requested via ?fields= are present
+    date: str
+    work: Optional[WorkStatus] = None
+    balance: Optional[float] = None
+    finance_daily: Optional[DailyStat] = None
+    sleep: Optional[SleepLog] = None
+    habits: Optional[DailyHabit] = None
+    sport_logs: Optional[List[SportLog]] = None
+    mind_logs: Optional[List[MindLog]] = None
+    stats_work: Optional[WorkStats] = None
+    stats_health: Optional[HealthStats] = None
+    stats_mind: Optional[MindStats] = None
+    discipline: Optional[DisciplineScore] = None
+
+# --- SYNC ---
+class SyncItem(BaseModel):
+    key: str # Client-generated idempotency key
+    op: str # "create", "update"
+    resource: str # "finance", "sport_log", "mind_log", "daily_habit"
+    id: Optional[int] = None # Row to update
+    date: Optional[datetime] = None # When it was captured on the device; default now
+    data: Dict[str, Any] = {}
+
+class SyncBatch(BaseModel):
+    items: List[SyncItem]
+
+class SyncResult(BaseModel):
+    key: str
+    status: str # "created", "updated", "duplicate", "error"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class SyncBatchResult(BaseModel):
+    results: List[SyncResult]
+    balance: int
+
+class ChangeEntry(BaseModel):
+    seq: int
+    resource: str # Table name, e.g. "finances"
+    op: str # "upsert", "delete"
+    id: int
+    data: Optional[Dict[str, Any]] = None # Current row for upserts
+
+class ChangeFeed(BaseModel):
+    version: int # Pass as ?since= next time
+    has_more: bool
+    changes: List[ChangeEntry]
@@ -0,0 +1,194 @@
+"""
+Discipline scoring engine for whole ranges and many owners at once.
+
+The live score (rollups.discipline_score) uses one fixed profile. Here the
+weights and targets are a Profile, chosen per owner, and a range is scored
+in one array pass over the daily feature vectors stored in daily_rollups
+(one row per owner and day). With numpy every component is a column
+operation; without it the same formulas run row by row. With
+DEFAULT_PROFILE the result equals the live score.
+
+Used to backtest new weightings over the whole user base:
+
+  python scoring.py --from 2026-01-01 --to 2026-06-30 \\
+      --profile '{"weights": {"sleep": 0.3, "work": 0.3, "mind": 0.2, "sport": 0.1, "habit": 0.1}}'
+
+Days without a stored rollup are not scored; `python rollups.py` backfills them.
+"""
+import argparse
+import json
+import statistics
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy.orm import Session
+import models, rollups, lazy_numpy
+
+# Rollup columns the components are computed from
+FEATURES = [
+    "sleep_hours", "work_planned", "work_completed", "mind_planned", "mind_completed",
+    "sport_completed", "meal_count", "morning_hygiene_done",
+]
+
+COMPONENTS = list(rollups.DISCIPLINE_WEIGHTS)
+
+class Profile:
+    """Component weights (summing to 1) and targets of the Discipline Index."""
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 sleep_target_hours: float = rollups.SLEEP_TARGET_HOURS, meal_target: int = rollups.MEAL_TARGET):
+        weights = dict(weights or rollups.DISCIPLINE_WEIGHTS)
+        if set(weights) != set(COMPONENTS):
+            raise ValueError(f"weights must have exactly: {', '.join(COMPONENTS)}")
+        if abs(sum(weights.values()) - 1.0) > 1e-9:
+            raise ValueError("weights must sum to 1")
+        if sleep_target_hours <= 0 or meal_target <= 0:
+            raise ValueError("targets must be positive")
+        # Component order as in the live score, so sums round the same way
+        self.weights = {name: float(weights[name]) for name in COMPONENTS}
+        self.sleep_target_hours = float(sleep_target_hours)
+        self.meal_target = meal_target
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Profile":
+        return cls(**data)
+
+DEFAULT_PROFILE = Profile()
+
+class DailyFeatures:
+    """Feature vectors of many (owner, day) rows, stored column-wise."""
+    def __init__(self, owner_ids: List[int], dates: List[date], columns: Dict[str, List[float]]):
+        self.owner_ids = owner_ids
+        self.dates = dates
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.owner_ids)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Dict[str, Any]]) -> "DailyFeatures":
+        """From dicts with owner_id, date and every FEATURE, e.g. rollup totals."""
+        return cls(
+            [row["owner_id"] for row in rows],
+            [row["date"] for row in rows],
+            {name: [float(row[name] or 0) for row in rows] for name in FEATURES},
+        )
+
+def load_features(db: Session, start_date: date, end_date: date, owner_ids: Optional[List[int]] = None) -> DailyFeatures:
+    """Stored rollups of the range, every owner unless owner_ids is given, in one query."""
+    R = models.DailyRollup
+    query = db.query(R.owner_id, R.date, *[getattr(R, name) for name in FEATURES]).filter(
+        R.date >= start_date, R.date <= end_date
+    )
+    if owner_ids is not None:
+        query = query.filter(R.owner_id.in_(owner_ids))
+    rows = query.order_by(R.owner_id, R.date).all()
+    return DailyFeatures.from_rows([row._asdict() for row in rows])
+
+PROFILE_FIELDS = COMPONENTS + ["sleep_target_hours", "meal_target"]
+
+def _profile_table(features: DailyFeatures, profiles: Dict[int, Profile], default: Profile):
+    # One row of PROFILE_FIELDS per distinct profile, and the row index of every feature row
+    table, index, position = [], [], {}
+    for owner_id in features.owner_ids:
+        profile = profiles.get(owner_id, default)
+        if id(profile) not in position:
+            position[id(profile)] = len(table)
+            table.append([*profile.weights.values(), profile.sleep_target_hours, float(profile.meal_target)])
+        index.append(position[id(profile)])
+    return table, index
+
+def _score_numpy(np, f: Dict[str, Any], table, index) -> Dict[str, Any]:
+    f = {name: np.asarray(values, dtype=float) for name, values in f.items()}
+    per_row = np.asarray(table, dtype=float)[np.asarray(index, dtype=np.intp)]
+    p = {name: per_row[:, i] for i, name in enumerate(PROFILE_FIELDS)}
+    zeros = np.zeros(len(f["sleep_hours"]))
+
+    def rate(done, planned):
+        return np.divide(f[done], f[planned], out=zeros.copy(), where=f[planned] != 0) * 100
+
+    components = {
+        "sleep": np.minimum(f["sleep_hours"] / p["sleep_target_hours"], 1.0) * 100,
+        "work": rate("work_completed", "work_planned"),
+        "mind": rate("mind_completed", "mind_planned"),
+        "sport": np.where(f["sport_completed"] > 0, 100.0, 0.0),
+        "habit": np.where(f["morning_hygiene_done"] != 0, 50.0, 0.0)
+                 + np.minimum(f["meal_count"] / p["meal_target"], 1.0) * 50,
+    }
+    # Summed in COMPONENTS order like rollups.weighted_score, then rounded by it
+    # (np.round scales by 10 first and rounds some x.x5 the other way)
+    total = zeros.copy()
+    for name in COMPONENTS:
+        total = total + components[name] * p[name]
+    components["score"] = np.fromiter(map(rollups.round_score, total.tolist()), dtype=float, count=len(total))
+    return components
+
+def _score_python(f: Dict[str, List[float]], table, index) -> Dict[str, List[float]]:
+    result = {name: [] for name in COMPONENTS + ["score"]}
+    weights = [dict(zip(COMPONENTS, profile)) for profile in table]
+    for i, row in enumerate(index):
+        p = dict(zip(PROFILE_FIELDS, table[row]))
+        totals = {name: f[name][i] for name in FEATURES}
+        components = rollups.discipline_components(totals, p["sleep_target_hours"], p["meal_target"])
+        for name in COMPONENTS:
+            result[name].append(components[name])
+        result["score"].append(rollups.weighted_score(components, weights[row]))
+    return result
+
+def score(features: DailyFeatures, profiles: Optional[Dict[int, Profile]] = None,
+          default: Profile = DEFAULT_PROFILE, vectorized: bool = True) -> Dict[str, Any]:
+    """
+    Scores every row of features with its owner's profile (default for owners without one).
+    Returns {"score": ..., "sleep": ..., ...}, one column per component, aligned with the rows;
+    numpy arrays when vectorized and numpy is installed, lists otherwise.
+    """
+    table, index = _profile_table(features, profiles or {}, default)
+    np = lazy_numpy.load() if vectorized else None
+    if np is not None:
+        return _score_numpy(np, features.columns, table, index)
+    return _score_python(features.columns, table, index)
+
+def summary(scores: Sequence[float]) -> Dict[str, Optional[float]]:
+    values = sorted(float(s) for s in scores)
+    if not values:
+        return {"days": 0, "mean": None, "p10": None, "p50": None, "p90": None}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {
+        "days": len(values),
+        "mean": round(statistics.fmean(values), 2),
+        "p10": pick(0.10),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+    }
+
+def backtest(db: Session, candidates: Dict[str, Profile], start_date: date, end_date: date,
+             owner_ids: Optional[List[int]] = None) -> Dict[str, Dict[str, Optional[float]]]:
+    """Score distribution of each candidate profile applied to every owner, from one load of the features."""
+    features = load_features(db, start_date, end_date, owner_ids)
+    return {name: summary(score(features, default=profile)["score"]) for name, profile in candidates.items()}
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Backtest a discipline profile against the current one")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, required=True)
+    parser.add_argument("--profile", type=json.loads, required=True,
+                        help='JSON, e.g. {"weights": {...}, "sleep_target_hours": 7, "meal_target": 3}')
+    parser.add_argument("owner_ids", nargs="*", type=int)
+    args = parser.parse_args(argv)
+    try:
+        candidate = Profile.from_dict(args.profile)
+    except (TypeError, ValueError) as e:
+        parser.error(f"--profile: {e}")
+
+    import database
+    db = database.SessionLocal()
+    try:
+        results = backtest(
+            db, {"current": DEFAULT_PROFILE, "candidate": candidate},
+            args.start, args.end, args.owner_ids or None
+        )
+    finally:
+        db.close()
+    for name, stats in results.items():
+        print(f"{name:9} " + "  ".join(f"{key} {value}" for key, value in stats.items()))
+
+if __name__ == "__main__":
+    main()
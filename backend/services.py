@@ -1,9 +1,11 @@
 from datetime import date, timedelta, datetime
-from typing import List, Dict, Any, Optional
-import pandas as pd
-import numpy as np
-from repositories import DailyDataRepository
+from typing import List, Dict, Any, Optional, Sequence
+import statistics
+from repositories import DailyDataRepository, group_by_day
 import models
+import rollups
+import streaks
+import lazy_numpy
 
 class DisciplineCalculator:
     def __init__(self, repo: DailyDataRepository):
@@ -12,127 +14,165 @@ class DisciplineCalculator:
     def calculate_daily_score(self, target_date: date) -> float:
         """
         Calculates Discipline Index (0-100) for a specific date.
-        Weights:
-        - Sleep: 20% (Target 8h)
-        - Work: 30% (Completion Rate)
-        - Mind: 25% (Completion Rate)
-        - Sport: 15% (Done or not)
-        - Habits: 10% (Hygiene + Meals)
+        The score is kept on the day's rollup, see rollups.discipline_score
+        for the weights.
         """
-        # Fetch data for single day
-        sleeps = self.repo.get_sleep_logs(target_date, target_date)
-        works = self.repo.get_works(target_date, target_date)
-        minds = self.repo.get_mind_logs(target_date, target_date)
-        sports = self.repo.get_sport_logs(target_date, target_date)
-        habits = self.repo.get_daily_habits(target_date, target_date)
-        
-        # 1. Sleep Score (20%)
-        sleep_score = 0
-        if sleeps:
-            total_seconds = 0
-            for s in sleeps:
-                if s.end_time and s.start_time:
-                    total_seconds += (s.end_time - s.start_time).total_seconds()
-            hours = total_seconds / 3600
-            # Curve: 8 hours is 100. <8 penalizes. >9 penalizes slightly? 
-            # Simple linear for MVP: min(hours / 8, 1) * 100
-            sleep_score = min(hours / 8.0, 1.0) * 100
-        
-        # 2. Work Score (30%)
-        work_score = 0
-        if works:
-            completed = sum(1 for w in works if w.is_completed)
-            work_score = (completed / len(works)) * 100
-        else:
-            # If no work planned, neutral or 0? 
-            # Assume 0 implies "No discipline to plan work". Or maybe N/A?
-            # Let's say 0 for now to encourage planning.
-            work_score = 0
-            
-        # 3. Mind Score (25%)
-        mind_score = 0
-        if minds:
-            completed_mind = sum(1 for m in minds if m.is_completed)
-            mind_score = (completed_mind / len(minds)) * 100
-            
-        # 4. Sport Score (15%)
-        sport_score = 0
-        if sports:
-            # Any sport done is good
-            sport_done = any(s.is_completed for s in sports)
-            sport_score = 100 if sport_done else 0
-            
-        # 5. Habit Score (10%)
-        habit_score = 0
-        if habits:
-            h = habits[0] # Assume 1 per day
-            hygiene_points = 50 if h.morning_hygiene_done else 0
-            # Meals: Target 3 = 50 pts. 
-            meal_points = min(h.meal_count / 3.0, 1.0) * 50
-            habit_score = hygiene_points + meal_points
-            
-        final_score = (
-            (sleep_score * 0.20) +
-            (work_score * 0.30) +
-            (mind_score * 0.25) +
-            (sport_score * 0.15) +
-            (habit_score * 0.10)
-        )
-        return round(final_score, 1)
+        return self.calculate_range(target_date, target_date)[target_date]
+
+    def calculate_range(self, start_date: date, end_date: date) -> Dict[date, float]:
+        """
+        Discipline Index for every day in [start_date, end_date],
+        read from one rollup row per day.
+        """
+        rows = rollups.get_range(self.repo, start_date, end_date)
+        return {day: row.discipline_score for day, row in rows.items()}
+
+# Windows (days) accepted by AnalyticsService.get_correlations
+CORRELATION_WINDOWS = (30, 90, 365)
+
+# Daily metrics correlated by AnalyticsService.get_correlations (matrix order)
+CORRELATION_METRICS = ["sleep_hours", "work_perf", "mind_perf", "sport_done", "habit_score", "expense"]
+
+# Windows up to this many days are correlated in pure Python;
+# numpy is only imported (on first use) for longer ones
+PURE_PYTHON_MAX_DAYS = 31
+
+def _correlation_matrix(series: Dict[str, Sequence[float]], vectorized: bool) -> Dict[str, Dict[str, Optional[float]]]:
+    """Pearson coefficient of every pair of series, None where a series is constant."""
+    names = list(series)
+    np = lazy_numpy.load() if vectorized else None
+    if np is not None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            raw = np.corrcoef(np.vstack([series[name] for name in names]))
+        return {
+            row: {col: (None if np.isnan(raw[i, j]) else float(raw[i, j])) for j, col in enumerate(names)}
+            for i, row in enumerate(names)
+        }
+
+    matrix = {row: {} for row in names}
+    for i, row in enumerate(names):
+        for col in names[i:]:
+            try:
+                value = 1.0 if row == col else statistics.correlation(series[row], series[col])
+                if row == col and len(set(series[row])) < 2:
+                    value = None
+            except statistics.StatisticsError:
+                value = None
+            matrix[row][col] = matrix[col][row] = value
+    return matrix
+
+# Value of one day's rollup for each aggregate module of get_detailed_stats
+ROLLUP_DAY_VALUES = {
+    'work': lambda r: (r.work_completed / r.work_planned) * 100 if r.work_planned else 0.0,
+    'health_sleep': lambda r: r.sleep_hours,
+    'mind_tasks': lambda r: r.mind_completed,
+    'health_sport': lambda r: r.sport_completed,
+    'finance_expense': lambda r: r.expense_total,
+}
 
 class AnalyticsService:
     def __init__(self, repo: DailyDataRepository):
         self.repo = repo
         
-    def get_correlations(self, days: int = 30) -> Dict[str, str]:
+    def daily_series(self, start_date: date, end_date: date, vectorized: bool = True) -> Dict[str, Sequence[float]]:
+        """
+        One series per metric (see CORRELATION_METRICS), one slot per day in
+        [start_date, end_date]. Raw rows are loaded as plain columns and
+        resampled to days with np.bincount, or with a plain loop when
+        vectorized is False or numpy is not installed.
+        """
+        np = lazy_numpy.load() if vectorized else None
+        n_days = (end_date - start_date).days + 1
+        origin = start_date.toordinal()
+
+        def columns(module, names, start=start_date):
+            rows = self.repo.get_columns(module, names, start, end_date)
+            return [list(col) for col in zip(*rows)] if rows else [[] for _ in names]
+
+        def per_day(stamps, values, how="sum"):
+            if np is None:
+                sums = [0.0] * n_days
+                counts = [0] * n_days
+                for stamp, value in zip(stamps, values):
+                    day = stamp.toordinal() - origin
+                    if 0 <= day < n_days:
+                        sums[day] = max(sums[day], value) if how == "max" else sums[day] + value
+                        counts[day] += 1
+                if how == "mean":
+                    return [total / count if count else 0.0 for total, count in zip(sums, counts)]
+                return sums
+
+            days = np.fromiter((s.toordinal() for s in stamps), dtype=np.int64, count=len(stamps)) - origin
+            values = np.asarray(values, dtype=float)
+            keep = (days >= 0) & (days < n_days)
+            days, values = days[keep], values[keep]
+            if how == "max":
+                out = np.zeros(n_days)
+                np.maximum.at(out, days, values)
+                return out
+            sums = np.bincount(days, weights=values, minlength=n_days)
+            if how == "mean":
+                counts = np.bincount(days, minlength=n_days)
+                return np.divide(sums, counts, out=np.zeros(n_days), where=counts > 0)
+            return sums
+
+        # Sleep is credited to the wake-up day, so include the night before the window
+        starts, ends = columns("sleep_logs", ["start_time", "end_time"], start_date - timedelta(days=1))
+        slept = [(s, e) for s, e in zip(starts, ends) if e is not None]
+        wake_times = [e for _, e in slept]
+        sleep_hours = [(e - s).total_seconds() / 3600 for s, e in slept]
+
+        work_dates, work_done = columns("works", ["date", "is_completed"])
+        mind_dates, mind_done = columns("mind_logs", ["date", "is_completed"])
+        sport_dates, sport_done = columns("sport_logs", ["date", "is_completed"])
+        habit_dates, meals, hygiene = columns("daily_habits", ["date", "meal_count", "morning_hygiene_done"])
+        fin_dates, amounts, types = columns("finances", ["date", "amount", "type"])
+
+        habit_points = [(50.0 if h else 0.0) + min((m or 0) / 3.0, 1.0) * 50 for m, h in zip(meals, hygiene)]
+        expense_dates = [d for d, t in zip(fin_dates, types) if t == "expense"]
+        expense_amounts = [a for a, t in zip(amounts, types) if t == "expense"]
+
+        return {
+            "sleep_hours": per_day(wake_times, sleep_hours),
+            "work_perf": per_day(work_dates, [100.0 if d else 0.0 for d in work_done], "mean"),
+            "mind_perf": per_day(mind_dates, [100.0 if d else 0.0 for d in mind_done], "mean"),
+            "sport_done": per_day(sport_dates, [1.0 if d else 0.0 for d in sport_done]),
+            "habit_score": per_day(habit_dates, habit_points, "max"),
+            "expense": per_day(expense_dates, expense_amounts),
+        }
+
+    def get_correlations(self, days: int = 30) -> Dict[str, Any]:
         """
         analyzes cross-table correlations.
         Example: Sleep duration vs Work Completion.
+        Returns Pearson coefficients between every pair of daily metrics
+        over the last `days` days, plus human readable insights.
+        Short windows are computed in pure Python so numpy is never imported for them.
         """
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        # Fetch data
-        sleeps = self.repo.get_sleep_logs(start_date, end_date)
-        works = self.repo.get_works(start_date, end_date)
-        finances = self.repo.get_finances(start_date, end_date)
-        
-        # Prepare DataFrames
-        data = []
-        # Iterate days
-        delta = (end_date - start_date).days
-        for i in range(delta + 1):
-            day = start_date + timedelta(days=i)
-            # Sleep (Previous night? Or same day wake up? Let's use wake date)
-            # SleepLog.start_time usually previous day, end_time is wake day.
-            # We associate sleep ending on 'day' with 'day's performance.
-            day_sleep = sum([(s.end_time - s.start_time).total_seconds()/3600 
-                             for s in sleeps 
-                             if s.end_time and s.end_time.date() == day])
-            
-            # Work
-            day_works = [w for w in works if w.date.date() == day]
-            work_perf = (sum(1 for w in day_works if w.is_completed) / len(day_works)) * 100 if day_works else 0
-            
-            # Finance Expense
-            day_finances = [f for f in finances if f.date.date() == day and f.type == 'expense']
-            expense = sum(f.amount for f in day_finances)
-            
-            data.append({
-                "date": day,
-                "sleep_hours": day_sleep,
-                "work_perf": work_perf,
-                "expense": expense
-            })
-            
-        df = pd.DataFrame(data)
-        if len(df) < 5:
-            return {"insight": "Ma'lumotlar yetarli emas (kamida 5 kun kerak)."}
+        vectorized = days > PURE_PYTHON_MAX_DAYS
+        series = self.daily_series(start_date, end_date, vectorized)
+        
+        active_days = sum(1 for values in zip(*series.values()) if any(values))
+        if active_days < 5:
+            return {
+                "insights": {"insight": "Ma'lumotlar yetarli emas (kamida 5 kun kerak)."},
+                "coefficients": {},
+            }
             
+        # Full matrix; constant series have no coefficient (None)
+        matrix = _correlation_matrix(series, vectorized)
+        coefficients = {
+            row: {col: (None if v is None else round(v, 3)) for col, v in values.items()}
+            for row, values in matrix.items()
+        }
+        
         insights = {}
         
         # 1. Sleep vs Work
-        corr_sleep_work = df['sleep_hours'].corr(df['work_perf'])
+        corr_sleep_work = matrix["sleep_hours"]["work_perf"] or 0.0
         if corr_sleep_work > 0.5:
             insights['sleep_work'] = "Siz ko'proq uxlagan kunlaringiz ish unumdorligingiz sezilarli oshadi!"
         elif corr_sleep_work < -0.3:
@@ -141,60 +181,20 @@ class AnalyticsService:
             insights['sleep_work'] = "Uyqu va ish unumdorligi o'rtasida kuchli bog'liqlik topilmadi."
 
         # 2. Work vs Expense (Stress spending?)
-        corr_work_expense = df['work_perf'].corr(df['expense'])
+        corr_work_expense = matrix["work_perf"]["expense"] or 0.0
         if corr_work_expense < -0.4:
             insights['work_expense'] = "Ishlar qolib ketganda ko'proq pul sarflashga moyilsiz (Stress Spending)."
             
-        return insights
+        return {"insights": insights, "coefficients": coefficients}
 
     def get_work_stats(self) -> Dict[str, Any]:
         end = datetime.now().date()
         start = end - timedelta(days=30)
         works = self.repo.get_works(start, end)
         
-        # Streak Calculation
-        # Assuming streak = consecutive days with at least one completed task?
-        streak = 0
-        current_check = end
-        while True:
-            day_works = [w for w in works if w.date.date() == current_check]
-            completed = any(w.is_completed for w in day_works) if day_works else False
-            # Or if WorkStatus (from today's specific table) was "active" or "passive"?
-            # Since Work model has is_completed, I'll use that.
-            if completed:
-                streak += 1
-                current_check -= timedelta(days=1)
-            else:
-                if current_check == end: # If today not done yet, don't break streak unless yesterday missed
-                     # Actually streak usually includes today if done, or continues from yesterday.
-                     # If today is 0, check yesterday.
-                     pass 
-                
-                # Check if yesterday missed
-                if current_check < end:
-                    break
-                
-                # If checking today and it's empty, move to yesterday
-                current_check -= timedelta(days=1)
-                # If yesterday also empty, streak ends
-                # Ideally: Streak is continuous chain.
-        
-        # Simpler Streak: Count consecutive days from yesterday back that have data
-        streak = 0
-        check_date = end - timedelta(days=1) # Start checking from yesterday
-        # Check today first
-        today_works = [w for w in works if w.date.date() == end and w.is_completed]
-        if today_works:
-            streak += 1
-            
-        while True:
-            day_works = [w for w in works if w.date.date() == check_date and w.is_completed]
-            if day_works:
-                streak += 1
-                check_date -= timedelta(days=1)
-            else:
-                break
-                
+        # Consecutive days with a completed work, up to today (or yesterday while today is open)
+        streak = streaks.get_streaks(self.repo.db, self.repo.owner_id, end, ["work"])["work"]["current"]
+
         # Weekly completion
         week_start = end - timedelta(days=6)
         week_works = [w for w in works if w.date.date() >= week_start]
@@ -287,7 +287,8 @@ class AnalyticsService:
     def get_detailed_stats(self, module_type: str, period: str = 'monthly') -> Dict[str, Any]:
         """
         Gets time-series data and growth comparison.
-        module_type: 'work', 'health_sleep', 'mind_tasks'
+        module_type: 'work', 'health_sleep', 'mind_tasks', 'mind_tasks_<id>',
+                     'health_sport', 'health_sport_<id>', 'finance_expense'
         period: 'monthly' (returns 30 daily points)
         """
         end = datetime.now().date()
@@ -296,12 +297,6 @@ class AnalyticsService:
         
         start = end - timedelta(days=(days_count + prev_days_count))
         
-        # Fetch all raw data for range
-        works = self.repo.get_works(start, end)
-        minds = self.repo.get_mind_logs(start, end)
-        finances = self.repo.get_finances(start, end)
-        sports = self.repo.get_sport_logs(start, end)
-        
         history = []
         
         current_values = []
@@ -332,42 +327,28 @@ class AnalyticsService:
             except:
                 pass
 
-        for i in range(total_range):
-             day = start + timedelta(days=i)
-             val = 0.0
-             
-             if base_module == 'work':
-                 d_works = [w for w in works if w.date.date() == day]
-                 if d_works:
-                     completed = sum(1 for w in d_works if w.is_completed)
-                     val = (completed / len(d_works)) * 100
-                 else:
-                     val = 0.0
-                     
-             elif base_module == 'health_sleep':
-                 d_sleeps = [s for s in sleeps if s.end_time and s.end_time.date() == day]
-                 hours = sum((s.end_time - s.start_time).total_seconds()/3600 for s in d_sleeps)
-                 val = hours
-                 
-             elif base_module == 'mind_tasks':
-                 d_minds = [m for m in minds if m.date.date() == day and m.is_completed is True]
-                 val = float(len(d_minds))
-                 
-             elif base_module == 'mind_tasks_single' and target_id:
-                 d_minds = [m for m in minds if m.date.date() == day and m.is_completed is True and m.task_type_id == target_id]
-                 val = float(len(d_minds)) # Should be 0 or 1 usually
+        # Module totals come from one rollup row per day. Per-type variants
+        # are not rolled up, so their raw rows are bucketed by day once;
+        # either way each day below is a dict lookup, not a rescan.
+        buckets = {}
+        day_value = len
+        
+        if base_module in ROLLUP_DAY_VALUES:
+            buckets = rollups.get_range(self.repo, start, end - timedelta(days=1))
+            day_value = ROLLUP_DAY_VALUES[base_module]
             
-             elif base_module == 'health_sport':
-                 d_sports = [s for s in sports if s.date.date() == day and s.is_completed is True]
-                 val = float(len(d_sports))
-                 
-             elif base_module == 'health_sport_single' and target_id:
-                 d_sports = [s for s in sports if s.date.date() == day and s.is_completed is True and s.exercise_type_id == target_id]
-                 val = float(len(d_sports)) # Should be 0 or 1
+        elif base_module == 'mind_tasks_single' and target_id:
+            minds = [m for m in self.repo.get_mind_logs(start, end) if m.is_completed is True and m.task_type_id == target_id]
+            buckets = group_by_day(minds, lambda m: m.date.date())
+            
+        elif base_module == 'health_sport_single' and target_id:
+            sports = [s for s in self.repo.get_sport_logs(start, end) if s.is_completed is True and s.exercise_type_id == target_id]
+            buckets = group_by_day(sports, lambda s: s.date.date())
 
-             elif base_module == 'finance_expense':
-                 d_fin = [f for f in finances if f.date.date() == day and f.type == 'expense']
-                 val = sum(f.amount for f in d_fin)
+        for i in range(total_range):
+             day = start + timedelta(days=i)
+             rows = buckets.get(day)
+             val = float(day_value(rows)) if rows else 0.0
                  
              # Store
              if i < prev_days_count:
@@ -436,10 +417,7 @@ class WeeklyReviewer:
         start = end - timedelta(days=7)
         
         # Average Discipline
-        scores = []
-        for i in range(7):
-            day = start + timedelta(days=i)
-            scores.append(self.calc.calculate_daily_score(day))
+        scores = list(self.calc.calculate_range(start, start + timedelta(days=6)).values())
         
         avg_score = sum(scores) / len(scores) if scores else 0
         
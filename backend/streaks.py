@@ -0,0 +1,171 @@
+"""
+Current and longest streaks of every module, kept per owner in the streaks table.
+
+A module's active days are the days with a completed work / sport log /
+mind log, or with the morning hygiene habit done. Each (owner, module)
+row holds the latest run (run_start .. last_day) and the longest one, so
+a read is one indexed lookup. rollups.refresh_day, which runs for every
+write, passes the day's active modules before and after the write to
+apply_day: a newly active day after the latest run extends it or starts
+a new one in place. Any other change of a day's activity is a past-day
+edit; the row is dropped and the next read recomputes it.
+
+The recompute is one gaps-and-islands query: numbering an owner's active
+days in order and subtracting that from the day number gives the same
+value for every day of an unbroken run (an island), so grouping by it
+yields all runs at once. The database returns only the longest and the
+latest run per module.
+
+The current streak is the latest run if it reaches today, or yesterday
+while today is still open, as the old work streak counted it.
+"""
+from sqlalchemy import Date, func, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Set
+import models
+from repositories import day_bounds
+
+# module -> (model, condition for an active day)
+MODULES = {
+    "work": (models.Work, models.Work.is_completed == True),
+    "sport": (models.SportLog, models.SportLog.is_completed == True),
+    "mind": (models.MindLog, models.MindLog.is_completed == True),
+    "habits": (models.DailyHabit, models.DailyHabit.morning_hygiene_done == True),
+}
+
+# module -> rollup total that is non-zero on an active day
+ROLLUP_ACTIVE = {
+    "work": "work_completed",
+    "sport": "sport_completed",
+    "mind": "mind_completed",
+    "habits": "morning_hygiene_done",
+}
+
+def active_modules(totals: Dict[str, Any]) -> Set[str]:
+    """Modules active on a day, from its rollup totals."""
+    return {module for module, field in ROLLUP_ACTIVE.items() if totals[field]}
+
+def _day_number(db: Session, day):
+    # Consecutive days -> consecutive numbers
+    if db.get_bind().dialect.name == "postgresql":
+        return day - literal(date(1970, 1, 1), Date)
+    return func.julianday(day)
+
+def _date(value) -> date:
+    # SQLite returns date() as text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _active_days(name: str, owner_id: int, today: date):
+    model, active = MODULES[name]
+    return select(literal(name).label("module"), func.date(model.date).label("day")).where(
+        model.owner_id == owner_id, active, model.date < day_bounds(today, today)[1]
+    ).distinct()
+
+def compute(db: Session, owner_id: int, modules: Iterable[str]) -> Dict[str, Dict[str, Optional[date]]]:
+    """Latest and longest run of each module from the raw rows, in one query."""
+    modules = list(modules)
+    today = datetime.now().date()
+    days = union_all(*[_active_days(name, owner_id, today) for name in modules]).subquery("days")
+
+    numbered = select(
+        days.c.module,
+        days.c.day,
+        (_day_number(db, days.c.day) - func.row_number().over(partition_by=days.c.module, order_by=days.c.day)).label("island"),
+    ).subquery("numbered")
+
+    islands = select(
+        numbered.c.module,
+        func.min(numbered.c.day).label("start"),
+        func.max(numbered.c.day).label("end"),
+        func.count().label("length"),
+    ).group_by(numbered.c.module, numbered.c.island).subquery("islands")
+
+    ranked = select(
+        islands,
+        # Longest run first per module, the earliest of equally long ones
+        func.row_number().over(
+            partition_by=islands.c.module, order_by=(islands.c.length.desc(), islands.c.start)
+        ).label("longest_rank"),
+        func.row_number().over(partition_by=islands.c.module, order_by=islands.c.end.desc()).label("latest_rank"),
+    ).subquery("ranked")
+
+    rows = db.execute(
+        select(ranked.c.module, ranked.c.start, ranked.c.end, ranked.c.length,
+               ranked.c.longest_rank, ranked.c.latest_rank)
+        .where((ranked.c.longest_rank == 1) | (ranked.c.latest_rank == 1))
+    ).all()
+
+    result = {
+        name: {"run_start": None, "last_day": None, "longest": 0, "longest_start": None, "longest_end": None}
+        for name in modules
+    }
+    for module, start, end, length, longest_rank, latest_rank in rows:
+        if latest_rank == 1:
+            result[module].update(run_start=_date(start), last_day=_date(end))
+        if longest_rank == 1:
+            result[module].update(longest=length, longest_start=_date(start), longest_end=_date(end))
+    return result
+
+def apply_day(db: Session, owner_id: int, day: date, before: Optional[Set[str]], after: Set[str]):
+    """
+    Updates the stored streaks after a day's rollup was recomputed.
+    before/after: the day's active modules (before is None for a day without a rollup yet).
+    Does not commit, the caller commits with the write.
+    """
+    changed = set(MODULES) if before is None else before ^ after
+    if not changed or day > datetime.now().date():
+        return
+    rows = db.query(models.Streak).filter(
+        models.Streak.owner_id == owner_id, models.Streak.module.in_(changed)
+    ).with_for_update().all()
+    for row in rows:
+        if row.last_day is not None and day <= row.last_day:
+            # A past day changed: recompute on the next read
+            db.delete(row)
+        elif row.module in after:
+            if row.last_day is not None and day == row.last_day + timedelta(days=1):
+                row.last_day = day
+            else:
+                row.run_start = row.last_day = day
+            length = (row.last_day - row.run_start).days + 1
+            if length > (row.longest or 0):
+                row.longest, row.longest_start, row.longest_end = length, row.run_start, row.last_day
+        # An inactive day after the latest run changes nothing
+
+def get_streaks(db: Session, owner_id: int, today: date = None, modules: Iterable[str] = tuple(MODULES)) -> Dict[str, Dict]:
+    """{module: {"current", "longest", "longest_start", "longest_end"}}, dates as "YYYY-MM-DD"."""
+    today = today or datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    modules = list(modules)
+
+    fields = ("run_start", "last_day", "longest", "longest_start", "longest_end")
+    streaks = {
+        row.module: {f: getattr(row, f) for f in fields} for row in db.query(models.Streak).filter(
+            models.Streak.owner_id == owner_id, models.Streak.module.in_(modules)
+        )
+    }
+    missing = [name for name in modules if name not in streaks]
+    if missing:
+        streaks.update(compute(db, owner_id, missing))
+        try:
+            db.add_all([models.Streak(owner_id=owner_id, module=name, **streaks[name]) for name in missing])
+            db.commit()
+        except IntegrityError:
+            # A concurrent request stored them first; the computed values are just as current
+            db.rollback()
+
+    result = {}
+    for name in modules:
+        streak = streaks[name]
+        current = 0
+        if streak["last_day"] is not None and streak["last_day"] >= yesterday:
+            current = (streak["last_day"] - streak["run_start"]).days + 1
+        result[name] = {
+            "current": current,
+            "longest": streak["longest"] or 0,
+            "longest_start": streak["longest_start"].isoformat() if streak["longest_start"] else None,
+            "longest_end": streak["longest_end"].isoformat() if streak["longest_end"] else None,
+        }
+    return result
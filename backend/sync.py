@@ -0,0 +1,213 @@
+"""
+/sync/batch: replays what a device captured offline in one request.
+
+Items are mixed creates and updates of finances, sport/mind logs and daily
+habits, each carrying a client-generated idempotency key. The whole batch
+is one transaction: existing rows are looked up with one query per
+resource, new rows go in with a single flush (batched INSERTs), the
+balance moves once by the net delta and every touched day's rollup is
+refreshed once.
+
+Applied keys are stored in sync_keys with the row they produced, so
+replaying a batch whose response was lost answers "duplicate" instead of
+applying it twice. An item that fails validation, or an update that would
+put a second log of the same type on a day, is reported as "error" and
+not keyed; the rest of the batch still applies.
+"""
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from datetime import date, datetime
+from typing import Dict, List, Set, Tuple
+import models, schemas, rollups, ledger, cache
+from cache import resource_versions
+from repositories import day_bounds
+
+MAX_ITEMS = 500
+
+OPS = ("create", "update")
+
+# resource -> (model, schema of data, cache module)
+RESOURCES = {
+    "finance": (models.Finance, schemas.FinanceCreate, cache.FINANCE),
+    "sport_log": (models.SportLog, schemas.SportLogCreate, cache.SPORT),
+    "mind_log": (models.MindLog, schemas.MindLogCreate, cache.MIND),
+    "daily_habit": (models.DailyHabit, schemas.DailyHabitCreate, cache.HABITS),
+}
+
+# One row per day (and type): a create for an existing one updates it, like crud does
+PER_DAY = {
+    "sport_log": "exercise_type_id",
+    "mind_log": "task_type_id",
+    "daily_habit": None,
+}
+
+def _validate(item: schemas.SyncItem):
+    """(values, None) or (None, error detail)"""
+    if item.resource not in RESOURCES:
+        return None, f"Unknown resource: {item.resource}"
+    if item.op not in OPS:
+        return None, f"Unknown op: {item.op}"
+    if item.op == "update" and item.id is None:
+        return None, "id is required for update"
+    try:
+        return RESOURCES[item.resource][1](**item.data).model_dump(), None
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+def _load(db: Session, owner_id: int, parsed, now: datetime):
+    # Rows to update by id and per-day rows on the days being created, one query each
+    ids: Dict[str, Set[int]] = {}
+    days: Dict[str, Set[date]] = {}
+    for item, values, error in parsed:
+        if error:
+            continue
+        if item.op == "update":
+            ids.setdefault(item.resource, set()).add(item.id)
+        elif item.resource in PER_DAY:
+            days.setdefault(item.resource, set()).add((item.date or now).date())
+
+    by_id = {}
+    for resource, wanted in ids.items():
+        model = RESOURCES[resource][0]
+        rows = db.query(model).filter(model.owner_id == owner_id, model.id.in_(wanted)).all()
+        by_id[resource] = {row.id: row for row in rows}
+        on_days = {row.date.date() for row in rows if row.date}
+        if resource in PER_DAY and on_days:
+            # An update may move a row onto a type already logged that day
+            days.setdefault(resource, set()).update(on_days)
+
+    by_day = {}
+    for resource, wanted in days.items():
+        model = RESOURCES[resource][0]
+        start, end = day_bounds(min(wanted), max(wanted))
+        rows = db.query(model).filter(model.owner_id == owner_id, model.date >= start, model.date < end).all()
+        type_column = PER_DAY[resource]
+        by_day[resource] = {
+            (row.date.date(), getattr(row, type_column) if type_column else None): row for row in rows
+        }
+    return by_id, by_day
+
+def _apply(db: Session, owner_id: int, items: List[schemas.SyncItem]) -> Tuple[List[schemas.SyncResult], Set[str]]:
+    now = datetime.now()
+    done = {
+        k.key: k for k in db.query(models.SyncKey).filter(
+            models.SyncKey.owner_id == owner_id,
+            models.SyncKey.key.in_({item.key for item in items})
+        )
+    }
+    parsed = [(item, *_validate(item)) for item in items]
+    if any(item.resource == "finance" and not error for item, _, error in parsed):
+        ledger.lock(db, owner_id)
+    by_id, by_day = _load(db, owner_id, parsed, now)
+
+    # (item, [status, row or id, detail]); new rows get their ids at the flush
+    entries = []
+    applied: Dict[str, list] = {}
+    balance_delta = 0
+    finance_ids = []
+    days: Set[date] = set()
+    modules: Set[str] = set()
+
+    for item, values, error in parsed:
+        if item.key in done:
+            entries.append((item, ["duplicate", done[item.key].result_id, None]))
+            continue
+        if item.key in applied:
+            entries.append((item, ["duplicate", applied[item.key][1], None]))
+            continue
+        if error:
+            entries.append((item, ["error", None, error]))
+            continue
+
+        model, _, module = RESOURCES[item.resource]
+        if item.op == "create":
+            when = item.date or now
+            key = None
+            if item.resource in PER_DAY:
+                type_column = PER_DAY[item.resource]
+                key = (when.date(), values[type_column] if type_column else None)
+            row = by_day[item.resource].get(key) if key else None
+            status = "updated" if row else "created"
+            if row is None:
+                row = model(**values, owner_id=owner_id, date=when)
+                db.add(row)
+                if key:
+                    by_day[item.resource][key] = row
+            else:
+                for field, value in values.items():
+                    setattr(row, field, value)
+            if item.resource == "finance":
+                balance_delta += ledger.delta(row.type, row.amount)
+        else:
+            row = by_id[item.resource].get(item.id)
+            if row is None:
+                entries.append((item, ["error", None, "Not found"]))
+                continue
+            if item.resource in PER_DAY and row.date:
+                type_column = PER_DAY[item.resource]
+                old_key = (row.date.date(), getattr(row, type_column) if type_column else None)
+                new_key = (row.date.date(), values[type_column] if type_column else None)
+                if new_key != old_key:
+                    if by_day[item.resource].get(new_key) not in (None, row):
+                        entries.append((item, ["error", None, "Conflicts with an existing log"]))
+                        continue
+                    if by_day[item.resource].get(old_key) is row:
+                        del by_day[item.resource][old_key]
+                    by_day[item.resource][new_key] = row
+            status = "updated"
+            if row.date:
+                days.add(row.date.date()) # The day it was on, should the update move it
+            old_delta = ledger.delta(row.type, row.amount) if item.resource == "finance" else 0
+            for field, value in values.items():
+                setattr(row, field, value)
+            if item.resource == "finance":
+                balance_delta += ledger.delta(row.type, row.amount) - old_delta
+                finance_ids.append(row.id)
+
+        entry = [status, row, None]
+        applied[item.key] = entry
+        entries.append((item, entry))
+        days.add(row.date.date() if row.date else now.date())
+        modules.add(module)
+
+    db.flush()
+    for _, entry in entries:
+        if isinstance(entry[1], models.Base):
+            entry[1] = entry[1].id
+    db.add_all([
+        models.SyncKey(key=item.key, resource=item.resource, op=item.op, result_id=entry[1], owner_id=owner_id)
+        for item, entry in entries if entry is applied.get(item.key)
+    ])
+
+    if cache.FINANCE in modules:
+        if finance_ids:
+            ledger.forget_from(db, owner_id, min(finance_ids))
+        ledger.record(db, owner_id, balance_delta)
+    for day in sorted(days):
+        rollups.refresh_day(db, owner_id, day)
+    db.commit()
+    if modules:
+        resource_versions.bump(owner_id, *modules)
+
+    results = [schemas.SyncResult(key=item.key, status=status, id=row_id, detail=detail)
+               for item, (status, row_id, detail) in entries]
+    return results, modules
+
+def apply_batch(db: Session, owner_id: int, items: List[schemas.SyncItem]) -> Tuple[List[schemas.SyncResult], Set[str]]:
+    """
+    Applies a batch in one transaction.
+    Returns the per-item results and the cache modules it changed.
+    """
+    try:
+        return _apply(db, owner_id, items)
+    except IntegrityError:
+        db.rollback()
+        raced = db.query(models.SyncKey.id).filter(
+            models.SyncKey.owner_id == owner_id,
+            models.SyncKey.key.in_({item.key for item in items})
+        ).first()
+        if raced is None:
+            raise
+        # A concurrent replay committed the same keys first; once more, they now read as duplicates
+        return _apply(db, owner_id, items)